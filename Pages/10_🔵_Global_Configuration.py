@@ -2,6 +2,7 @@ import streamlit as st
 import os #for file navigation
 from rdflib import Graph, URIRef, Literal, Namespace, BNode
 import utils
+import rdf_writers
 import pandas as pd
 import pickle
 from rdflib.namespace import split_uri
@@ -204,7 +205,7 @@ def save_progress():
     st.session_state["save_progress_success"] = True
 
 def export_mapping_to_file():
-    st.session_state["g_mapping"].serialize(destination=export_file_path, format=export_format)
+    rdf_writers.serialize_graph(st.session_state["g_mapping"], export_file_path, export_format)   #compressed if .gz or .zst
     st.session_state["export_file_input"] = ""
     st.session_state["export_success"] = True
 
@@ -1328,11 +1329,17 @@ if st.session_state["10_option_button"] == "em":
 
     export_format_list = list(export_extension_dict)
 
-    valid_extensions = tuple(export_extension_dict.values())
+    export_compression_dict = {"none": ""}     #{compression: extension} (zstd only if zstandard is installed)
+    for compression in rdf_writers.get_compression_list():
+        export_compression_dict[compression] = rdf_writers.COMPRESSION_EXTENSIONS[compression]
+
+    valid_extensions = tuple(extension + compression_extension for extension in export_extension_dict.values()
+        for compression_extension in export_compression_dict.values())
 
     with col1a:
         export_format = st.selectbox("Select format for export file", export_format_list, key="export_format")
-    export_extension = export_extension_dict[export_format]
+        export_compression = st.selectbox("Select compression (optional)", list(export_compression_dict), key="export_compression")
+    export_extension = export_extension_dict[export_format] + export_compression_dict[export_compression]
 
     with col1a:
         export_file_input = st.text_input("Enter export filename (without extension)", key="export_file_input")
@@ -1342,7 +1349,7 @@ if st.session_state["10_option_button"] == "em":
                 border-radius:5px; color:#856404; border:1px solid #ffeeba;">
                     ⚠️ The filename <b style="color:#cc9a06;">{export_file_input}</b>
                     seems to include an extension. <br> Please note that the extension
-                    <code>{export_extension_dict[export_format]}</code>
+                    <code>{export_extension}</code>
                     will be added.</div>
             """, unsafe_allow_html=True)
             st.write("")
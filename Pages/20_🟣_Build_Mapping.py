@@ -2,6 +2,7 @@ import streamlit as st
 import os #for file navigation
 from rdflib import Graph, URIRef, Literal, Namespace, BNode
 import utils
+import materializer
 import pandas as pd
 import pickle
 from rdflib.namespace import split_uri
@@ -37,9 +38,13 @@ def save_tmap_new_ls():   #function to save TriplesMap upon click
         logical_source_iri = LS[f"{logical_source_label}"]
     else:
         logical_source_iri = BNode()
-    utils.add_logical_source(st.session_state["g_mapping"], tmap_label, selected_ds, logical_source_iri)
+    utils.add_logical_source(st.session_state["g_mapping"], tmap_label, selected_ds, logical_source_iri,
+        table=selected_ds_table, query=ds_query, iterator=ds_iterator)
     utils.update_dictionaries()             #to update tmap_dict
     st.session_state["ds_list"] = "Select a data source"      #restart input variables
+    st.session_state["ds_table_list"] = "Select a table"
+    st.session_state["ds_query"] = ""
+    st.session_state["ds_iterator"] = ""
     st.session_state["tmap_label_input"] = ""
     st.session_state["save_tmap_success"] = True
 
@@ -452,7 +457,27 @@ if st.session_state["20_option_button"] == "map":
                             st.write("")
                         logical_source_label = ""   #ignore logical source label if it already exists
 
-                if selected_ds != "Select a data source":
+                selected_ds_table, ds_query = None, ""      #SQLite data sources: table or query
+                if selected_ds != "Select a data source" and utils.is_ds_sqlite(selected_ds):
+                    with col1a:
+                        ds_table_list = utils.get_ds_table_list(os.path.join(ds_folder_path, selected_ds))
+                        ds_table_list.insert(0, "Select a table")
+                        selected_ds_table = st.selectbox("Choose a table:", ds_table_list, key="ds_table_list")
+                        ds_query = st.text_area("Or enter an SQL query (optional, used instead of the table):",
+                            key="ds_query").strip()
+                    if selected_ds_table == "Select a table":
+                        selected_ds_table = None
+
+                ds_iterator = ""      #JSON and XML data sources: iterator (optional)
+                if selected_ds != "Select a data source" and selected_ds.lower().endswith((".json", ".xml")):
+                    default_iterator = (materializer.DEFAULT_JSON_ITERATOR if selected_ds.lower().endswith(".json")
+                        else materializer.DEFAULT_XML_ITERATOR)
+                    with col1a:
+                        ds_iterator = st.text_input(f"Enter the iterator (optional, {default_iterator} by default):",
+                            key="ds_iterator").strip()
+
+                if selected_ds != "Select a data source" and (not utils.is_ds_sqlite(selected_ds)
+                    or selected_ds_table or ds_query):
                     st.session_state["selected_ds"] = selected_ds
                     with col1a:
                         save_tmap_button_new_ls = st.button("Save TriplesMap", on_click=save_tmap_new_ls)
@@ -692,6 +717,47 @@ if st.session_state["20_option_button"] == "s":
                 st.write("")
 
 
+    #PREVIEW THE TRIPLES OF THE LAST SAVED SUBJECT MAP__________________
+    #the TriplesMap is run against the first rows of its data source (cached, see utils.get_triplesmap_preview)
+    if st.session_state["smap_ordered_list"]:
+
+        preview_tmap_label = split_uri(st.session_state["smap_ordered_list"][0])[1]
+
+        with col2:
+            col2a,col2b = st.columns([0.1,2])
+            with col2b:
+                st.markdown(f"""
+                    <div style='text-align: right; font-size: 14px; color: grey;'>
+                        preview of TriplesMap {preview_tmap_label}
+                    </div>
+                """, unsafe_allow_html=True)
+                preview_n_rows = st.number_input("Rows of the data source", min_value=1, max_value=1000,
+                    value=10, key="preview_n_rows")
+
+                try:
+                    preview_df = utils.get_triplesmap_preview(preview_tmap_label, preview_n_rows)
+                except (OSError, ValueError) as e:
+                    preview_df = None
+                    st.markdown(f"""
+                        <div style="background-color:#f8d7da; padding:1em;
+                                    border-radius:5px; color:#721c24; border:1px solid #f5c6cb;">
+                            ❌ The TriplesMap <b style="color:#a94442;">{preview_tmap_label}</b>
+                            cannot be materialized:<br>{e}
+                        </div>
+                    """, unsafe_allow_html=True)
+
+                if preview_df is not None and preview_df.empty:
+                    st.markdown(f"""
+                        <div style="background-color:#fff3cd; padding:1em;
+                        border-radius:5px; color:#856404; border:1px solid #ffeeba;">
+                            ⚠️ The TriplesMap <b style="color:#cc9a06;">{preview_tmap_label}</b>
+                            generates no triples in the first {preview_n_rows} rows of its data source.</div>
+                    """, unsafe_allow_html=True)
+                elif preview_df is not None:
+                    st.dataframe(preview_df, hide_index=True)
+                st.write("")
+
+
 
 #ADD NEW SUBJECT MAP_________________________________________________________
     with col1:
@@ -865,8 +931,7 @@ if st.session_state["20_option_button"] == "s":
                     data_source = next(st.session_state["g_mapping"].objects(tmap_logical_source_iri, RML.source), None)   #name of ds file
                     if data_source:
                         data_source_file = os.path.join(os.getcwd(), "data_sources", data_source)    #full path of ds file
-                        columns_df = pd.read_csv(data_source_file)
-                        column_list = columns_df.columns.tolist()
+                        column_list = utils.get_ds_column_list(data_source_file, tmap_logical_source_iri)    #only the header is read
                     else:
                         column_list = []
 
@@ -1887,8 +1952,7 @@ if st.session_state["20_option_button"] == "po":
 
 
             if data_source:
-                columns_df = pd.read_csv(data_source)
-                column_list = columns_df.columns.tolist()
+                column_list = utils.get_ds_column_list(data_source, map_logical_source)    #only the header is read
                 column_list.insert(0, "Select a data source")
             else:
                 column_list = []
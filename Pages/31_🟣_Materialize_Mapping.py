@@ -0,0 +1,201 @@
+import streamlit as st
+import os #for file navigation
+import json
+import time
+import pandas as pd
+import utils
+import materializer
+import rdf_writers
+
+
+#____________________________________________
+#PRELIMINARY
+
+#Aesthetics
+utils.import_st_aesthetics()
+st.write("")
+
+st.title("Materialize mapping")
+
+col1,col2 = st.columns([2,1.5])
+if "g_mapping" not in st.session_state or not st.session_state["g_label"]:
+    with col1:
+        st.markdown(f"""
+        <div style="background-color:#f8d7da; padding:1em;
+                    border-radius:5px; color:#721c24; border:1px solid #f5c6cb;">
+            ❗ You need to create or load a mapping. Please go to the
+            <b style="color:#a94442;">Global Configuration page</b>.
+        </div>
+        """, unsafe_allow_html=True)
+        st.stop()
+
+#initialise session state variables
+if "materialize_report_path" not in st.session_state:
+    st.session_state["materialize_report_path"] = ""
+
+#directories
+export_folder = os.path.join(os.getcwd(), "exported_mappings")    #folder of the materialized triples (and exported mappings)
+utils.check_directories()
+
+PROGRESS_REFRESH_SECONDS = 0.5    #minimum time between two updates of the progress panel
+
+
+#define on_click functions
+def discard_checkpoint():
+    os.remove(checkpoint_path)
+    st.session_state["materialize_report_path"] = ""
+
+
+#Function to get the stats of a run as a dataframe (one row per TriplesMap, see materializer.get_empty_stats)
+def get_stats_df(stats_dict):
+
+    row_list = []
+    for tmap_label, stats in stats_dict.items():
+        tmap_seconds = stats["read_seconds"] + stats["template_seconds"] + stats["join_seconds"] + stats["write_seconds"]
+        row_list.append({"TriplesMap": tmap_label, "Rows": stats["rows"], "Triples": stats["triples"],
+            "Bytes": stats["bytes"], "Read (s)": round(stats["read_seconds"], 3),
+            "Template (s)": round(stats["template_seconds"], 3), "Join (s)": round(stats["join_seconds"], 3),
+            "Write (s)": round(stats["write_seconds"], 3),
+            "Triples/s": round(stats["triples"] / tmap_seconds) if tmap_seconds else 0})
+
+    return pd.DataFrame(row_list)
+
+
+#____________________________________________
+#RUN MATERIALIZATION
+with col1:
+    st.markdown("""
+    <div style="background-color:#e6e6fa; border:1px solid #511D66;
+                border-radius:5px; padding:10px; margin-bottom:8px;">
+        <div style="font-size:1.1rem; font-weight:600; color:#511D66;">
+            ⚙️ Run materialization
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    st.write("")
+
+with col1:
+    col1a, col1b = st.columns([2,1])
+
+output_extension_dict = {"N-Triples": ".nt", "N-Quads": ".nq"}
+output_compression_dict = {"none": ""}     #{compression: extension} (zstd only if zstandard is installed)
+for compression in rdf_writers.get_compression_list():
+    output_compression_dict[compression] = rdf_writers.COMPRESSION_EXTENSIONS[compression]
+
+with col1a:
+    output_format = st.selectbox("Select output format", list(output_extension_dict), key="materialize_format")
+    output_compression = st.selectbox("Select compression (optional)", list(output_compression_dict),
+        key="materialize_compression")
+    output_file_input = st.text_input("Enter output filename (without extension)", value=st.session_state["g_label"],
+        key="materialize_file_input")
+    workers = st.number_input("Worker processes (0 = one per core)", min_value=0, value=1, key="materialize_workers")
+    dedup_checkbox = st.checkbox("Write each triple only once", key="materialize_dedup")
+    checkpoint_checkbox = st.checkbox("Write checkpoints (an interrupted run can be resumed)",
+        key="materialize_checkpoint", disabled=(workers != 1))
+
+output_file = output_file_input + output_extension_dict[output_format] + output_compression_dict[output_compression]
+output_path = os.path.join(export_folder, output_file)
+checkpoint_path = materializer.get_checkpoint_path(output_path)
+report_path = materializer.get_report_path(output_path)
+resume_run = checkpoint_checkbox and workers == 1 and os.path.isfile(checkpoint_path)
+
+with col1b:
+    st.markdown(f"""
+    <div style="border:1px dashed #511D66; padding:10px; border-radius:5px; margin-bottom:8px;">
+        <span style="font-size:0.95rem;">
+            Mapping <b style="color:#007bff;"> {st.session_state["g_label"]}</b> will be materialized
+            into <code>{output_file}</code> in folder 📁exported_mappings, with the report of the run
+            in <code>{os.path.basename(report_path)}</code>.
+        </span>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if resume_run:
+        st.markdown(f"""
+            <div style="background-color:#fff3cd; padding:1em;
+            border-radius:5px; color:#856404; border:1px solid #ffeeba;">
+                ⚠️ A previous run into <b style="color:#cc9a06;">{output_file}</b>
+                was interrupted. <br> The run will be resumed from its last checkpoint.</div>
+        """, unsafe_allow_html=True)
+        st.write("")
+        st.button("Discard checkpoint", on_click=discard_checkpoint)
+
+if output_file_input:
+    with col1a:
+        run_button = st.button("Resume materialization" if resume_run else "Run materialization")
+else:
+    run_button = False
+
+
+#PROGRESS OF THE RUN__________________________________________
+#the panel is updated while the mapping is materialized (see materializer.materialize)
+#if the page is left during a run with checkpoints, the run is resumed from its last checkpoint the next time
+if run_button:
+
+    with col1:
+        progress_placeholder = st.empty()
+    start = time.perf_counter()
+    last_refresh = [0.0]
+
+    def show_progress(stats_dict, force=False):
+        if not force and time.perf_counter() - last_refresh[0] < PROGRESS_REFRESH_SECONDS:
+            return
+        last_refresh[0] = time.perf_counter()
+        seconds = time.perf_counter() - start
+        total_triples = sum(stats["triples"] for stats in stats_dict.values())
+        with progress_placeholder.container():
+            st.markdown(f"""
+                <div style='text-align: right; font-size: 14px; color: grey;'>
+                    {total_triples:,} triples in {seconds:.1f} s ({total_triples / seconds if seconds else 0:,.0f} triples/s)
+                </div>
+            """, unsafe_allow_html=True)
+            st.dataframe(get_stats_df(stats_dict), hide_index=True)
+
+    try:
+        #the plan is compiled again on every run (the mapping is edited in place, see materializer.get_mapping_plan)
+        plan = materializer.compile_mapping_plan(st.session_state["g_mapping"])
+        stats_dict = materializer.materialize(plan, output_path, workers=workers or None,
+            dedup_memory=rdf_writers.DEFAULT_DEDUP_MEMORY if dedup_checkbox else None,
+            checkpoint_path=checkpoint_path if checkpoint_checkbox and workers == 1 else None,
+            progress=show_progress, report_path=report_path)
+    except (OSError, ValueError) as e:
+        st.session_state["materialize_report_path"] = ""
+        with col1:
+            st.markdown(f"""
+                <div style="background-color:#f8d7da; padding:1em;
+                            border-radius:5px; color:#721c24; border:1px solid #f5c6cb;">
+                    ❌ The mapping <b style="color:#a94442;">{st.session_state["g_label"]}</b>
+                    cannot be materialized:<br>{e}
+                </div>
+            """, unsafe_allow_html=True)
+    else:
+        show_progress(stats_dict, force=True)
+        st.session_state["materialize_report_path"] = report_path
+        with col1:
+            st.markdown(f"""
+            <div style="background-color:#d4edda; padding:1em;
+            border-radius:5px; color:#155724; border:1px solid #c3e6cb;">
+                ✅ The mapping <b style="color:#0f5132;">{st.session_state["g_label"]}
+                </b> has been materialized into file
+                <b style="color:#0f5132;">{output_file}
+                </b>.  </div>
+            """, unsafe_allow_html=True)
+
+
+#REPORT OF THE LAST RUN__________________________________________
+if st.session_state["materialize_report_path"] and os.path.isfile(st.session_state["materialize_report_path"]):
+
+    with open(st.session_state["materialize_report_path"], "r", encoding="utf-8") as f:
+        report = json.load(f)
+
+    with col2:
+        col2a,col2b = st.columns([0.1,2])
+        with col2b:
+            st.markdown(f"""
+                <div style='text-align: right; font-size: 14px; color: grey;'>
+                    report of the last run ({report["seconds"]:.1f} s, {report["total"]["triples"]:,} triples)
+                </div>
+            """, unsafe_allow_html=True)
+            st.dataframe(get_stats_df(report["triplesmaps"]), hide_index=True)
+            st.download_button("Download report (JSON)", json.dumps(report, indent=2),
+                file_name=os.path.basename(st.session_state["materialize_report_path"]), mime="application/json")
@@ -0,0 +1,262 @@
+import os #for file navigation
+import sys
+import argparse
+import pickle
+import numpy as np
+import pandas as pd
+from rdflib import Graph, URIRef, Literal, Namespace, BNode
+from rdflib.namespace import RDF, RDFS, OWL, XSD
+
+#Generators of synthetic data for the benchmarks (see run.py)
+#csv data sources, mappings (saved as in the app, pkl) and ontologies (RDF/XML, as loaded in the app)
+#the generated files only depend on their parameters, so they are only generated once (and can be shared by runs)
+#python benchmarks/generate.py csv 1000000 benchmarks/data/data_sources
+#python benchmarks/generate.py mapping 1000 benchmarks/data/saved_mappings
+#python benchmarks/generate.py ontology 100 benchmarks/data/ontologies
+
+
+#_________________________________________________________
+#Namespaces (same as utils.get_predefined_ns_dict)
+RML = Namespace("http://semweb.mmlab.be/ns/rml#")
+RR = Namespace("http://www.w3.org/ns/r2rml#")
+QL = Namespace("http://rdfolio.org/" + "/ql#")
+MAP = Namespace("http://rdfolio.org/" + "/mapping#")
+LS = Namespace("http://rdfolio.org/" + "/logicalSource#")
+BENCH = Namespace("http://example.org/benchmark#")     #classes and properties of the generated ontologies
+
+CSV_BLOCK_ROWS = 1_000_000    #rows generated at a time (memory does not grow with the size of the file)
+CSV_COLUMNS = ["id", "parent_id", "name", "category", "value", "date", "description"]
+CATEGORIES = 100     #distinct values of the category column
+
+#size of the BIBO ontology (Bibliographic Ontology), the ontologies are generated as multiples of it
+BIBO_CLASSES = 69
+BIBO_OBJECT_PROPERTIES = 52
+BIBO_DATATYPE_PROPERTIES = 54
+BIBO_INDIVIDUALS = 40
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to get the name of the generated files
+def get_csv_filename(n_rows):
+    return f"bench_{n_rows}.csv"
+
+def get_mapping_filename(n_triplesmaps, n_rows):
+    return f"bench_{n_triplesmaps}_tmaps_{n_rows}.pkl"
+
+def get_ontology_filename(scale):
+    return f"bench_ontology_x{scale}.owl"
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to get the rows of the benchmark csv from start to end (a DataFrame)
+#id is unique, parent_id references the id of another row (for joins), every 100th description has commas,
+#quotes and a line break (quoted records)
+def get_csv_block(start, end, seed=0):
+
+    rng = np.random.default_rng([seed, start])
+    ids = np.arange(start, end)
+    id_strings = ids.astype(str).astype(object)
+
+    descriptions = "Description of item " + id_strings
+    quoted_rows = ids % 100 == 0
+    descriptions[quoted_rows] = 'Item "' + id_strings[quoted_rows] + '", with commas,\nand two lines'
+
+    return pd.DataFrame({
+        "id": ids,
+        "parent_id": ids // 10,
+        "name": "Name " + id_strings,
+        "category": "category_" + (ids % CATEGORIES).astype(str).astype(object),
+        "value": rng.random(len(ids)).round(4),
+        "date": (np.datetime64("2000-01-01") + (ids % 3650).astype("timedelta64[D]")).astype(str),
+        "description": descriptions})
+
+#Function to generate a csv data source with n_rows rows (see get_csv_block)
+#returns the path of the file (it is not generated again if it exists)
+def generate_csv(n_rows, folder, seed=0):
+
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, get_csv_filename(n_rows))
+    if os.path.isfile(file_path):
+        return file_path
+
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(CSV_COLUMNS) + "\n")
+        for start in range(0, n_rows, CSV_BLOCK_ROWS):
+            get_csv_block(start, min(start + CSV_BLOCK_ROWS, n_rows), seed).to_csv(f, header=False, index=False)
+    os.replace(temp_path, file_path)
+
+    return file_path
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to add a TriplesMap of the benchmark csv to a mapping, as the Build Mapping page builds it:
+#logical source (LS namespace), labelled subject map with a template and a class, and predicate-object maps
+#(attached to the subject map) with references to the columns of the csv
+#with parent_tmap_iri, a referencing object map with a join condition (parent_id = id) is added
+def add_benchmark_triplesmap(g, i, source_file, parent_tmap_iri=None):
+
+    tmap_iri = MAP[f"TriplesMap{i}"]
+    logical_source_iri = LS[f"LogicalSource{i}"]
+    smap_iri = MAP[f"SubjectMap{i}"]
+
+    g.add((tmap_iri, RML.logicalSource, logical_source_iri))
+    g.add((logical_source_iri, RML.source, Literal(source_file)))
+    g.add((logical_source_iri, QL.referenceFormulation, QL.CSV))
+
+    g.add((tmap_iri, RR.subjectMap, smap_iri))
+    g.add((smap_iri, RR.template, Literal(f"http://example.org/resource/item{i}/{{id}}")))
+    g.add((smap_iri, RR["class"], BENCH[f"Class{i % BIBO_CLASSES}"]))
+
+    for column, datatype in [("name", None), ("category", None), ("value", XSD.decimal), ("date", XSD.date)]:
+        po_map = BNode()
+        object_map = BNode()
+        g.add((smap_iri, RR.predicateObjectMap, po_map))
+        g.add((po_map, RR.predicate, BENCH[column]))
+        g.add((po_map, RR.objectMap, object_map))
+        g.add((object_map, RML.reference, Literal(column)))
+        if datatype:
+            g.add((object_map, RR.datatype, datatype))
+
+    if parent_tmap_iri is not None:
+        po_map = BNode()
+        object_map = BNode()
+        join_condition = BNode()
+        g.add((smap_iri, RR.predicateObjectMap, po_map))
+        g.add((po_map, RR.predicate, BENCH.parent))
+        g.add((po_map, RR.objectMap, object_map))
+        g.add((object_map, RR.parentTriplesMap, parent_tmap_iri))
+        g.add((object_map, RR.joinCondition, join_condition))
+        g.add((join_condition, RR.child, Literal("parent_id")))
+        g.add((join_condition, RR.parent, Literal("id")))
+
+    return tmap_iri
+
+#Function to build a mapping with n_triplesmaps TriplesMaps of the benchmark csv with n_rows rows
+#with joins=True, each TriplesMap after the first one also references the first one (join parent_id = id)
+def build_mapping(n_triplesmaps, n_rows, joins=False):
+
+    g = Graph()
+    g.bind("rml", RML)
+    g.bind("rr", RR)
+    g.bind("ql", QL)
+    g.bind("map", MAP)
+    g.bind("logicalSource", LS)
+    g.bind("bench", BENCH)
+
+    first_tmap_iri = None
+    for i in range(n_triplesmaps):
+        tmap_iri = add_benchmark_triplesmap(g, i, get_csv_filename(n_rows), first_tmap_iri if joins else None)
+        first_tmap_iri = first_tmap_iri or tmap_iri
+
+    return g
+
+#Function to generate a mapping (see build_mapping), saved as the app saves its progress (pickle of the graph)
+#returns the path of the file (it is not generated again if it exists)
+def generate_mapping(n_triplesmaps, n_rows, folder):
+
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, get_mapping_filename(n_triplesmaps, n_rows))
+    if os.path.isfile(file_path):
+        return file_path
+
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump(build_mapping(n_triplesmaps, n_rows), f)
+    os.replace(temp_path, file_path)
+
+    return file_path
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to build an ontology with the size of BIBO times scale: classes (with a class hierarchy), object and
+#datatype properties (with domain and range) and individuals, all with labels and comments
+def build_ontology(scale=1):
+
+    g = Graph()
+    g.bind("bench", BENCH)
+    g.bind("owl", OWL)
+
+    ontology_iri = URIRef("http://example.org/benchmark")
+    g.add((ontology_iri, RDF.type, OWL.Ontology))
+    g.add((ontology_iri, RDFS.label, Literal(f"Benchmark ontology (BIBO size x{scale})")))
+
+    n_classes = BIBO_CLASSES * scale
+    for i in range(n_classes):
+        class_iri = BENCH[f"Class{i}"]
+        g.add((class_iri, RDF.type, OWL.Class))
+        g.add((class_iri, RDFS.label, Literal(f"Class {i}", lang="en")))
+        g.add((class_iri, RDFS.comment, Literal(f"Generated class number {i} of the benchmark ontology.", lang="en")))
+        if i:
+            g.add((class_iri, RDFS.subClassOf, BENCH[f"Class{(i - 1) // 4}"]))
+
+    for i in range(BIBO_OBJECT_PROPERTIES * scale):
+        property_iri = BENCH[f"objectProperty{i}"]
+        g.add((property_iri, RDF.type, OWL.ObjectProperty))
+        g.add((property_iri, RDFS.label, Literal(f"object property {i}", lang="en")))
+        g.add((property_iri, RDFS.domain, BENCH[f"Class{i % n_classes}"]))
+        g.add((property_iri, RDFS.range, BENCH[f"Class{(i * 7) % n_classes}"]))
+
+    for i in range(BIBO_DATATYPE_PROPERTIES * scale):
+        property_iri = BENCH[f"datatypeProperty{i}"]
+        g.add((property_iri, RDF.type, OWL.DatatypeProperty))
+        g.add((property_iri, RDFS.label, Literal(f"datatype property {i}", lang="en")))
+        g.add((property_iri, RDFS.domain, BENCH[f"Class{i % n_classes}"]))
+        g.add((property_iri, RDFS.range, XSD.string))
+
+    for i in range(BIBO_INDIVIDUALS * scale):
+        individual_iri = BENCH[f"individual{i}"]
+        g.add((individual_iri, RDF.type, OWL.NamedIndividual))
+        g.add((individual_iri, RDF.type, BENCH[f"Class{i % n_classes}"]))
+        g.add((individual_iri, RDFS.label, Literal(f"individual {i}", lang="en")))
+
+    return g
+
+#Function to generate an ontology (see build_ontology) as an RDF/XML file (the format loaded by the app)
+#returns the path of the file (it is not generated again if it exists)
+def generate_ontology(scale, folder):
+
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, get_ontology_filename(scale))
+    if os.path.isfile(file_path):
+        return file_path
+
+    temp_path = file_path + ".tmp"
+    build_ontology(scale).serialize(temp_path, format="xml")
+    os.replace(temp_path, file_path)
+
+    return file_path
+
+#________________________________________________________
+
+
+#_________________________________________________________
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog="generate.py", description="Generate synthetic data for the benchmarks.")
+    parser.add_argument("kind", choices=["csv", "mapping", "ontology"])
+    parser.add_argument("size", type=int, help="rows (csv), TriplesMaps (mapping) or multiple of BIBO (ontology)")
+    parser.add_argument("folder", help="output folder")
+    parser.add_argument("--rows", type=int, default=10_000, help="rows of the csv referenced by the mapping")
+    args = parser.parse_args(argv)
+
+    if args.kind == "csv":
+        print(generate_csv(args.size, args.folder))
+    elif args.kind == "mapping":
+        print(generate_mapping(args.size, args.rows, args.folder))
+    else:
+        print(generate_ontology(args.size, args.folder))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#________________________________________________________
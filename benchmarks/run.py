@@ -0,0 +1,356 @@
+import os #for file navigation
+import sys
+import json
+import time
+import pickle
+import argparse
+import platform
+import statistics
+import subprocess
+import pandas as pd
+import rdflib
+from rdflib import Graph
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+REPO_FOLDER = os.path.dirname(BENCHMARK_FOLDER)
+sys.path.insert(0, REPO_FOLDER)
+
+import generate
+import materializer
+import rdf_writers
+
+try:
+    import utils    #needs streamlit (the mapping authoring scenarios are skipped without it)
+except ImportError:
+    utils = None
+
+#Benchmarks of mapping authoring (utils functions used by the pages), saving, exporting and materializing mappings
+#on synthetic data (see generate.py), with machine-readable results that can be compared between commits
+#python benchmarks/run.py run --preset quick
+#python benchmarks/run.py run --preset full --only materialize
+#python benchmarks/run.py compare benchmarks/data/results/OLD.json benchmarks/data/results/NEW.json
+#the generated data is kept in the data folder (benchmarks/data by default), so it is only generated once
+
+
+#_________________________________________________________
+#Sizes of each preset: csv rows (materialization), TriplesMaps (mapping authoring, save, load and export)
+#and ontologies (multiples of the size of BIBO)
+PRESETS = {
+    "quick": {"rows": [10**4, 10**5], "triplesmaps": [1, 10, 100], "ontologies": [1]},
+    "default": {"rows": [10**4, 10**5, 10**6], "triplesmaps": [1, 10, 100, 1000], "ontologies": [1, 100]},
+    "full": {"rows": [10**4, 10**5, 10**6, 10**7, 10**8], "triplesmaps": [1, 10, 100, 1000, 5000], "ontologies": [1, 100]},
+}
+DEFAULT_REPEAT = 3    #runs of each scenario (the median is reported)
+MAX_JOIN_ROWS = 10**6    #the join scenario is only run up to this size
+EXPORT_FORMATS = ["turtle", "ntriples"]
+REGRESSION_THRESHOLD = 1.2    #compare: a scenario is slower if its time grows more than this factor
+RESULTS_FORMAT = 1
+#________________________________________________________
+
+
+#_________________________________________________________
+#Functions to get the folders of the generated data
+def get_ds_folder(data_folder):
+    return os.path.join(data_folder, "data_sources")
+
+def get_mapping_folder(data_folder):
+    return os.path.join(data_folder, "saved_mappings")
+
+def get_ontology_folder(data_folder):
+    return os.path.join(data_folder, "ontologies")
+
+def get_output_folder(data_folder):
+    os.makedirs(os.path.join(data_folder, "output"), exist_ok=True)
+    return os.path.join(data_folder, "output")
+
+#Function to load a generated mapping (generated if needed)
+def load_benchmark_mapping(data_folder, n_triplesmaps, n_rows=10**4):
+    with open(generate.generate_mapping(n_triplesmaps, n_rows, get_mapping_folder(data_folder)), "rb") as f:
+        return pickle.load(f)
+
+#utils reads the mapping from st.session_state, which only works inside `streamlit run`,
+#so the scenarios give it a plain dictionary with the mapping
+def set_session_state(g_mapping):
+    utils.st.session_state = {"g_label": "benchmark", "g_mapping": g_mapping, "g_ontology": Graph()}
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#SCENARIOS
+#each scenario prepares its data and returns (setup, run): setup() is called before each run (not timed) and
+#returns the argument of run, run(argument) is timed and returns the metrics of the run (dictionary or None)
+
+def bench_update_dictionaries(data_folder, triplesmaps):
+
+    g = load_benchmark_mapping(data_folder, triplesmaps)
+
+    def run(argument):
+        utils.update_dictionaries()
+        return {"triplesmaps": len(utils.st.session_state["tmap_dict"])}
+
+    return lambda: set_session_state(g), run
+
+def bench_build_complete_subject_df(data_folder, triplesmaps):
+
+    g = load_benchmark_mapping(data_folder, triplesmaps)
+
+    def setup():
+        set_session_state(g)
+        utils.update_dictionaries()
+
+    def run(argument):
+        return {"rows": len(utils.build_complete_subject_df())}
+
+    return setup, run
+
+def bench_remove_triplesmap(data_folder, triplesmaps):
+
+    mapping_data = pickle.dumps(load_benchmark_mapping(data_folder, triplesmaps))
+
+    def setup():    #a new copy of the mapping for each run
+        set_session_state(pickle.loads(mapping_data))
+        utils.update_dictionaries()
+
+    def run(argument):
+        return {"removed_triples": len(utils.remove_triplesmap(f"TriplesMap{triplesmaps // 2}"))}
+
+    return setup, run
+
+def bench_save_mapping(data_folder, triplesmaps):
+
+    g = load_benchmark_mapping(data_folder, triplesmaps)
+    file_path = os.path.join(get_output_folder(data_folder), "saved_mapping.pkl")
+
+    def run(argument):
+        with open(file_path, "wb") as f:
+            pickle.dump(g, f)
+        return {"bytes": os.path.getsize(file_path)}
+
+    return None, run
+
+def bench_load_mapping(data_folder, triplesmaps):
+
+    file_path = generate.generate_mapping(triplesmaps, 10**4, get_mapping_folder(data_folder))
+
+    def run(argument):
+        with open(file_path, "rb") as f:
+            return {"triples": len(pickle.load(f))}
+
+    return None, run
+
+def bench_export_mapping(data_folder, triplesmaps, format):
+
+    g = load_benchmark_mapping(data_folder, triplesmaps)
+    file_path = os.path.join(get_output_folder(data_folder), "exported_mapping." + format)
+
+    def run(argument):
+        rdf_writers.serialize_graph(g, file_path, format)
+        return {"bytes": os.path.getsize(file_path)}
+
+    return None, run
+
+def bench_load_ontology(data_folder, scale):
+
+    file_path = generate.generate_ontology(scale, get_ontology_folder(data_folder))
+
+    def run(argument):
+        g = Graph()
+        g.parse(file_path, format="xml")    #as the Global Configuration page
+        return {"triples": len(g)}
+
+    return None, run
+
+def bench_materialize(data_folder, rows, joins=False):
+
+    generate.generate_csv(rows, get_ds_folder(data_folder))
+    g = generate.build_mapping(2 if joins else 1, rows, joins)
+    output_path = os.path.join(get_output_folder(data_folder), "materialized.nt")
+
+    def run(argument):
+        stats_dict = materializer.materialize(g, output_path, ds_folder=get_ds_folder(data_folder))
+        metrics = {key: sum(stats[key] for stats in stats_dict.values()) for key in materializer.get_empty_stats()}
+        metrics["output_bytes"] = os.path.getsize(output_path)
+        return metrics
+
+    return None, run
+
+def bench_materialize_join(data_folder, rows):
+    return bench_materialize(data_folder, rows, joins=True)
+
+#{scenario: (function, needs utils)}
+BENCHMARKS = {
+    "update_dictionaries": (bench_update_dictionaries, True),
+    "build_complete_subject_df": (bench_build_complete_subject_df, True),
+    "remove_triplesmap": (bench_remove_triplesmap, True),
+    "save_mapping": (bench_save_mapping, False),
+    "load_mapping": (bench_load_mapping, False),
+    "export_mapping": (bench_export_mapping, False),
+    "load_ontology": (bench_load_ontology, False),
+    "materialize": (bench_materialize, False),
+    "materialize_join": (bench_materialize_join, False),
+}
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to get the list of (scenario, parameters) of a preset
+def get_benchmark_list(preset):
+
+    sizes = PRESETS[preset]
+    benchmark_list = []
+    for triplesmaps in sizes["triplesmaps"]:
+        for name in ["update_dictionaries", "build_complete_subject_df", "remove_triplesmap", "save_mapping", "load_mapping"]:
+            benchmark_list.append((name, {"triplesmaps": triplesmaps}))
+        for export_format in EXPORT_FORMATS:
+            benchmark_list.append(("export_mapping", {"triplesmaps": triplesmaps, "format": export_format}))
+    for scale in sizes["ontologies"]:
+        benchmark_list.append(("load_ontology", {"scale": scale}))
+    for rows in sizes["rows"]:
+        benchmark_list.append(("materialize", {"rows": rows}))
+        if rows <= MAX_JOIN_ROWS:
+            benchmark_list.append(("materialize_join", {"rows": rows}))
+
+    return benchmark_list
+
+#Function to get the key of a result (scenario[parameter=value,...]), the same in all the runs
+def get_benchmark_id(name, params):
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+#Function to run a scenario repeat times
+#returns {"name", "params", "seconds" (median), "min_seconds", "runs" (seconds of each run), "metrics"}
+def run_benchmark(name, params, data_folder, repeat=DEFAULT_REPEAT):
+
+    function, needs_utils = BENCHMARKS[name]
+    if needs_utils and utils is None:
+        return {"name": name, "params": params, "skipped": "streamlit is not installed (utils cannot be imported)"}
+
+    setup, run = function(data_folder, **params)
+    run_list = []
+    metrics = None
+    for i in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        metrics = run(argument)
+        run_list.append(time.perf_counter() - start)
+
+    return {"name": name, "params": params, "seconds": statistics.median(run_list), "min_seconds": min(run_list),
+        "runs": run_list, "metrics": metrics or {}}
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to get the commit of the repository (None if it is not a git repository)
+def get_git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_FOLDER, capture_output=True, text=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def get_environment():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        "pandas": pd.__version__, "rdflib": rdflib.__version__,
+        "pyarrow": materializer.pa.__version__ if materializer.pa is not None else None}
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Command to run the benchmarks and save the results (JSON, with sorted keys so that results can be diffed)
+def run_benchmarks(args):
+
+    data_folder = os.path.abspath(args.data)
+    commit = get_git_commit()
+    output_path = args.output or os.path.join(data_folder, "results",
+        f"{commit[:12] if commit else time.strftime('%Y%m%d-%H%M%S')}-{args.preset}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    result_dict = {}
+    for name, params in get_benchmark_list(args.preset):
+        if args.only and name not in args.only:
+            continue
+        benchmark_id = get_benchmark_id(name, params)
+        result_dict[benchmark_id] = run_benchmark(name, params, data_folder, args.repeat)
+        if "skipped" in result_dict[benchmark_id]:
+            print(f"{benchmark_id:<56}{'skipped':>12}")
+        else:
+            print(f"{benchmark_id:<56}{result_dict[benchmark_id]['seconds']:>12.4f} s")
+
+    results = {"format": RESULTS_FORMAT, "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": commit,
+        "preset": args.preset, "repeat": args.repeat, "environment": get_environment(), "results": result_dict}
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results: {output_path}")
+
+    return 0
+
+#Command to compare two results files: time of each scenario in both, and ratio (new / old)
+#returns 1 if some scenario is slower than the threshold (e.g. to fail a CI job)
+def compare_results(args):
+
+    with open(args.old, "r", encoding="utf-8") as f:
+        old_results = json.load(f)["results"]
+    with open(args.new, "r", encoding="utf-8") as f:
+        new_results = json.load(f)["results"]
+
+    slower_list = []
+    print(f"{'scenario':<56}{'old s':>12}{'new s':>12}{'ratio':>10}")
+    for benchmark_id in sorted(set(old_results) & set(new_results)):
+        old_seconds = old_results[benchmark_id].get("seconds")
+        new_seconds = new_results[benchmark_id].get("seconds")
+        if old_seconds is None or new_seconds is None:    #skipped
+            continue
+        ratio = new_seconds / old_seconds if old_seconds else float("inf")
+        flag = "  slower" if ratio > args.threshold else "  faster" if ratio < 1 / args.threshold else ""
+        if ratio > args.threshold:
+            slower_list.append(benchmark_id)
+        print(f"{benchmark_id:<56}{old_seconds:>12.4f}{new_seconds:>12.4f}{ratio:>10.2f}{flag}")
+
+    for benchmark_id in sorted(set(old_results) ^ set(new_results)):
+        print(f"{benchmark_id:<56} only in {'old' if benchmark_id in old_results else 'new'} results")
+
+    if slower_list:
+        print(f"{len(slower_list)} scenarios are more than {args.threshold:.2f}x slower")
+        return 1
+
+    return 0
+
+#________________________________________________________
+
+
+#_________________________________________________________
+def get_argument_parser():
+
+    parser = argparse.ArgumentParser(prog="run.py", description="Run or compare the RDFolio benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and save the results")
+    run_parser.add_argument("--preset", choices=list(PRESETS), default="quick", help="sizes of the data (default: quick)")
+    run_parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=None, help="scenarios to run")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs of each scenario")
+    run_parser.add_argument("--data", default=os.path.join(BENCHMARK_FOLDER, "data"),
+        help="folder of the generated data and results (default: benchmarks/data)")
+    run_parser.add_argument("--output", default=None,
+        help="results file (default: DATA/results/COMMIT-PRESET.json)")
+    run_parser.set_defaults(function=run_benchmarks)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("old", help="results of the baseline (e.g. the previous commit)")
+    compare_parser.add_argument("new", help="results to compare")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+        help="ratio new / old above which a scenario is reported as slower (default: 1.2)")
+    compare_parser.set_defaults(function=compare_results)
+
+    return parser
+
+def main(argv=None):
+    args = get_argument_parser().parse_args(argv)
+    return args.function(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#________________________________________________________
@@ -0,0 +1,2635 @@
+import os #for file navigation
+import re
+import asyncio
+import functools
+import io
+import json
+import math
+import pickle
+import hashlib
+import sqlite3
+import urllib.parse
+from collections import namedtuple, OrderedDict
+from xml.etree import ElementTree
+import shutil
+import tempfile
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from rdflib import URIRef, Literal, Namespace, BNode
+from rdflib.namespace import split_uri
+from rdflib.namespace import RDF
+from rdf_writers import NTriplesWriter, DedupNTriplesWriter, ShardedNTriplesWriter, GraphNTriplesWriter, get_rdf_format, get_lines, open_output_file, split_output_path
+
+try:
+    import pyarrow as pa    #optional, only needed for parquet data sources
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+#RML materialization engine
+#runs the mapping built in the Build Mapping page (st.session_state["g_mapping"]) against its data sources
+#this module does not import streamlit (nor utils), so it can also be used outside the app
+
+
+#_________________________________________________________
+#Namespaces (same as utils.get_predefined_ns_dict)
+RML = Namespace("http://semweb.mmlab.be/ns/rml#")
+RR = Namespace("http://www.w3.org/ns/r2rml#")
+
+DEFAULT_CHUNKSIZE = 100_000    #rows read from the data source at a time
+SHARD_COPY_BUFFER = 16 * 1024 * 1024    #buffer to merge the output shards
+CSV_SCAN_BLOCK = 4 * 1024 * 1024    #block to look for record boundaries in csv files
+CSV_SPLIT_MIN_BYTES = 64 * 1024 * 1024    #csv files are only split in ranges of at least this size
+JSON_READ_BLOCK = 1024 * 1024    #characters read at a time from JSON data sources
+DEFAULT_JOIN_MEMORY = 512 * 1024 * 1024    #memory budget for the build side of a join
+JOIN_MIN_PARTITIONS = 8     #partitions on disk when a join does not fit in memory
+JOIN_MAX_PARTITIONS = 1024
+SEEN_SUBJECTS_MEMORY = 64 * 1024 * 1024    #memory for the subject hashes remembered in a scan (see get_new_subject_rows)
+SQLITE_EXTENSIONS = ("db", "sqlite", "sqlite3")    #SQLite data sources (rr:tableName or rml:query)
+PIPELINE_QUEUE_SIZE = 2    #chunks waiting between two stages of the pipeline (see run_chunk_pipeline)
+DEFAULT_CHECKPOINT_INTERVAL = 60    #seconds between two checkpoints of a run (see MaterializationCheckpoint)
+#________________________________________________________
+
+
+#______________________________________________
+#Directories
+def get_ds_folder_path():
+    return os.path.join(os.getcwd(), "data_sources")
+
+#__________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the label of a node (same as split_uri, but it does not fail)
+def get_node_label(node):
+    try:
+        return split_uri(node)[1]
+    except:
+        return str(node)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get a term map as a dictionary
+#{"type": template/constant/reference, "value": str, "term_type": IRI/BlankNode/Literal,
+#"datatype": str, "language": str, "template": compiled template (see compile_template)}
+def get_term_map(g, term_map_node, default_term_type):
+
+    term_map = {"type": None, "value": None, "term_type": None, "datatype": None, "language": None,
+        "template": None}
+
+    template = g.value(term_map_node, RR.template)
+    constant = g.value(term_map_node, RR.constant)
+    reference = g.value(term_map_node, RML.reference)
+    if reference is None:
+        reference = g.value(term_map_node, RR.column)    #R2RML-style reference
+
+    if template is not None:
+        term_map["type"] = "template"
+        term_map["value"] = str(template)
+        term_map["template"] = compile_template(str(template))    #parsed only once
+    elif constant is not None:
+        term_map["type"] = "constant"
+        term_map["value"] = str(constant)
+    elif reference is not None:
+        term_map["type"] = "reference"
+        term_map["value"] = str(reference)
+    else:
+        return None
+
+    datatype = g.value(term_map_node, RR.datatype)
+    language = g.value(term_map_node, RR.language)
+    if datatype is not None:
+        term_map["datatype"] = str(datatype)
+    if language is not None:
+        term_map["language"] = str(language)
+
+    term_type = g.value(term_map_node, RR.termType)
+    if term_type is not None:
+        term_map["term_type"] = get_node_label(term_type)
+    elif default_term_type != "Literal":   #subjects and predicates (constants are saved as literals by the app)
+        term_map["term_type"] = default_term_type
+    elif datatype is not None or language is not None:
+        term_map["term_type"] = "Literal"
+    elif term_map["type"] == "template":    #objects from templates are IRIs by default
+        term_map["term_type"] = "IRI"
+    elif term_map["type"] == "constant" and not isinstance(constant, Literal):
+        term_map["term_type"] = "IRI"
+    else:
+        term_map["term_type"] = "Literal"
+
+    return term_map
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get a constant term map (from the rr:predicate, rr:object... shortcuts)
+def get_constant_term_map(node):
+
+    if isinstance(node, Literal):
+        term_type = "Literal"
+        datatype = str(node.datatype) if node.datatype else None
+        language = node.language
+    elif isinstance(node, BNode):
+        term_type = "BlankNode"
+        datatype, language = None, None
+    else:
+        term_type = "IRI"
+        datatype, language = None, None
+
+    return {"type": "constant", "value": str(node), "term_type": term_type,
+        "datatype": datatype, "language": language, "template": None}
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get how the records of a logical source are read: {"iterator", "table", "query"} (None if missing)
+#(table and query are the rr:tableName and rml:query / rr:sqlQuery of SQLite data sources)
+def get_logical_source_options(g, logical_source):
+
+    iterator = g.value(logical_source, RML.iterator)
+    table = g.value(logical_source, RR.tableName)
+    query = g.value(logical_source, RML.query)
+    if query is None:
+        query = g.value(logical_source, RR.sqlQuery)    #R2RML-style query
+
+    return {
+        "iterator": str(iterator) if iterator is not None else None,
+        "table": str(table) if table is not None else None,
+        "query": str(query) if query is not None else None,
+        }
+
+#Function to get the logical source of a TriplesMap as a dictionary
+#{"label", "iri", "source", "reference_formulation", "iterator", "table", "query"}
+def get_logical_source_rules(g, tmap):
+
+    logical_source = g.value(tmap, RML.logicalSource)
+    source = g.value(logical_source, RML.source)
+    reference_formulation = g.value(logical_source, RML.referenceFormulation)
+    if reference_formulation is None:   #the app binds it with the ql prefix of the rdfolio base iri
+        reference_formulation = next((o for p, o in g.predicate_objects(logical_source)
+            if get_node_label(p) == "referenceFormulation"), None)
+
+    return {
+        "label": get_node_label(tmap),
+        "iri": str(tmap),
+        "source": str(source) if source is not None else None,
+        "reference_formulation": get_node_label(reference_formulation) if reference_formulation is not None else None,
+        **get_logical_source_options(g, logical_source),
+        }
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the subject term map of a TriplesMap (None if it has no Subject Map)
+def get_subject_term_map(g, tmap):
+
+    subject_map = g.value(tmap, RR.subjectMap)
+    if subject_map is not None:
+        return get_term_map(g, subject_map, "IRI")
+    if g.value(tmap, RR.subject) is not None:
+        return get_constant_term_map(g.value(tmap, RR.subject))
+
+    return None
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get a referencing object map (rr:parentTriplesMap) as a dictionary
+#{"parent_triplesmap": label, "parent_source": logical source rules, "parent_subject": term map,
+#"join_conditions": [{"child": column, "parent": column}]}
+def get_referencing_object_map(g, object_map_node):
+
+    parent_tmap = g.value(object_map_node, RR.parentTriplesMap)
+
+    join_conditions = []
+    for join_condition in sorted(g.objects(object_map_node, RR.joinCondition)):
+        child = g.value(join_condition, RR.child)
+        parent = g.value(join_condition, RR.parent)
+        if child is not None and parent is not None:
+            join_conditions.append({"child": str(child), "parent": str(parent)})
+
+    return {
+        "parent_triplesmap": get_node_label(parent_tmap),
+        "parent_source": get_logical_source_rules(g, parent_tmap),
+        "parent_subject": get_subject_term_map(g, parent_tmap),
+        "join_conditions": join_conditions,
+        }
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the graphs of a subject map or predicate-object map (rr:graph and rr:graphMap)
+#constant graphs are encoded here (once), rr:defaultGraph is None and the other graph maps are term maps
+#returns a list without repetitions (empty if no graph is given)
+def get_graph_maps(g, node):
+
+    graph_maps = [get_constant_term_map(graph) for graph in sorted(g.objects(node, RR.graph))]
+    graph_maps += [get_term_map(g, graph_map, "IRI") for graph_map in sorted(g.objects(node, RR.graphMap))]
+
+    graph_list = []
+    for graph_map in graph_maps:
+        if graph_map is None:
+            continue
+        if graph_map["type"] != "constant":
+            graph = graph_map
+        elif graph_map["value"] == str(RR.defaultGraph):
+            graph = None
+        else:
+            graph = encode_term(graph_map["value"], graph_map)
+        if graph not in graph_list:
+            graph_list.append(graph)
+
+    return graph_list
+
+#Function to check whether a list of graphs only has constant graphs (or the default graph)
+def has_constant_graphs(graph_list):
+    return not any(isinstance(graph, dict) for graph in graph_list)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the rules of a TriplesMap
+#{"label", "iri", "source", "reference_formulation", "iterator",
+#"subject", "graphs", "classes", "predicate_object_maps", "columns", "subject_triples"}
+#graphs are the graphs of the subject map (see get_graph_maps), [None] for the default graph
+#the graphs of each predicate-object map are resolved here too (its own graphs plus those of the subject map)
+#columns are the references of the TriplesMap, the only columns read from its data source (without its joins)
+#subject_triples are the triples that only depend on the subject (see get_subject_triples)
+#the result only contains strings, lists and dictionaries (so that it can be sent to other processes)
+def get_tmap_rules(g, tmap):
+
+    rules = get_logical_source_rules(g, tmap)
+    rules["subject"] = get_subject_term_map(g, tmap)
+    rules["classes"] = []
+    rules["predicate_object_maps"] = []
+
+    subject_map = g.value(tmap, RR.subjectMap)
+    subject_graphs = []
+    if subject_map is not None:
+        rules["classes"] = sorted(str(c) for c in g.objects(subject_map, RR["class"]) if isinstance(c, URIRef))
+        subject_graphs = get_graph_maps(g, subject_map)
+    rules["graphs"] = subject_graphs or [None]
+
+    #predicate-object maps (the Build Mapping page attaches them to the subject map)
+    pom_nodes = list(g.objects(tmap, RR.predicateObjectMap))
+    if subject_map is not None:
+        pom_nodes += [pom for pom in g.objects(subject_map, RR.predicateObjectMap) if pom not in pom_nodes]
+
+    for pom in sorted(pom_nodes):
+        predicates = [get_constant_term_map(p) for p in sorted(g.objects(pom, RR.predicate))]
+        predicates += [get_term_map(g, pm, "IRI") for pm in sorted(g.objects(pom, RR.predicateMap))]
+        objects = [get_constant_term_map(o) for o in sorted(g.objects(pom, RR.object))]
+        referencing_objects = []
+        for om in sorted(g.objects(pom, RR.objectMap)):
+            if g.value(om, RR.parentTriplesMap) is not None:
+                referencing_objects.append(get_referencing_object_map(g, om))
+            else:
+                objects.append(get_term_map(g, om, "Literal"))
+        predicates = [p for p in predicates if p]
+        objects = [o for o in objects if o]
+        graphs = subject_graphs + [graph for graph in get_graph_maps(g, pom) if graph not in subject_graphs]
+        if predicates and (objects or referencing_objects):
+            rules["predicate_object_maps"].append({"predicates": predicates, "objects": objects,
+                "referencing_objects": referencing_objects, "graphs": graphs or [None]})
+
+    rules["columns"] = get_triplesmap_references(rules)
+    rules["subject_triples"] = get_subject_triples(rules)
+
+    return rules
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the rules of every TriplesMap of the mapping
+#{TriplesMap label: rules} (see get_tmap_rules)
+def get_triplesmap_rules(g):
+
+    rules_dict = {}
+
+    for tmap in sorted(set(g.subjects(RML.logicalSource, None))):     #sorted, so the output order is always the same
+        rules = get_tmap_rules(g, tmap)
+        rules_dict[rules["label"]] = rules
+
+    return rules_dict
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#EXECUTION PLAN
+#the mapping is compiled once into an immutable plan (TriplesMap rules with compiled templates,
+#data sources and join edges), cached against the mapping graph (see get_mapping_plan)
+#the materializer uses the plan instead of querying the rdflib graph again
+
+#read-only dictionary (it can still be pickled, to send the plan to other processes)
+class PlanDict(dict):
+
+    def read_only(self, *args, **kwargs):
+        raise TypeError("The execution plan is immutable")
+
+    __setitem__ = __delitem__ = __ior__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+
+    def __reduce__(self):
+        return (PlanDict, (dict(self),))
+
+#triplesmaps: {TriplesMap label: rules} (see get_triplesmap_rules)
+#sources: {(source, reference formulation, iterator): (TriplesMap labels)}
+#join_edges: ((child TriplesMap label, parent TriplesMap label, ((child column, parent column)...))...)
+MappingPlan = namedtuple("MappingPlan", ["mapping_hash", "triplesmaps", "sources", "join_edges"])
+
+PLAN_CACHE_SIZE = 16
+plan_cache = OrderedDict()    #{(id of the mapping graph, number of triples): (weak reference to the graph, plan)}
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get a hash of the content of the mapping (same triples -> same hash)
+def get_mapping_hash(g):
+
+    def get_node_key(node):
+        if isinstance(node, Literal):
+            return f"L{node}\x01{node.datatype or ''}\x01{node.language or ''}"
+        return f"{type(node).__name__[0]}{node}"
+
+    mapping_hash = hashlib.sha256()
+    for triple in sorted("\x00".join(get_node_key(node) for node in triple) for triple in g):
+        mapping_hash.update(triple.encode("utf-8", "surrogatepass"))
+        mapping_hash.update(b"\n")
+
+    return mapping_hash.hexdigest()
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to make the rules immutable (dictionaries -> PlanDict, lists -> tuples)
+def freeze_rules(value):
+
+    if isinstance(value, dict):
+        return PlanDict({k: freeze_rules(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_rules(v) for v in value)
+
+    return value
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the key of the data source of a TriplesMap (TriplesMaps with the same key read the same data)
+#(the iterator and the reference formulation do not change how a csv file is read)
+def get_source_key(rules):
+
+    if is_sqlite_source(rules):
+        return (rules["source"], "SQL2008", rules["query"] or rules["table"])
+    if is_tabular_source(rules):
+        return (rules["source"], "Parquet" if is_parquet_source(rules) else "CSV", None)
+
+    return (rules["source"], rules["reference_formulation"], rules["iterator"])
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to compile the mapping into an execution plan
+def compile_mapping_plan(g):
+
+    triplesmaps = freeze_rules(get_triplesmap_rules(g))
+
+    sources = {}
+    join_edges = []
+    for tmap_label, rules in triplesmaps.items():
+        sources.setdefault(get_source_key(rules), []).append(tmap_label)
+        for pom in rules["predicate_object_maps"]:
+            for ref_object in pom["referencing_objects"]:
+                join_edges.append((tmap_label, ref_object["parent_triplesmap"],
+                    tuple((c["child"], c["parent"]) for c in ref_object["join_conditions"])))
+
+    return MappingPlan(get_mapping_hash(g), triplesmaps,
+        freeze_rules(sources), tuple(join_edges))
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to compile the rules of a single TriplesMap (e.g. for a preview, without compiling the whole plan)
+def compile_tmap_rules(g, tmap):
+    return freeze_rules(get_tmap_rules(g, tmap))
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the execution plan of the mapping (compiled only the first time the graph is seen)
+#the cache key is cheap (the identity of the graph and its number of triples), so it is not recomputed on every call,
+#but a graph edited in place without changing its number of triples (e.g. a class replaced by another one)
+#is not seen as changed: use compile_mapping_plan for graphs that are being edited
+def get_mapping_plan(g):
+
+    if isinstance(g, MappingPlan):
+        return g
+
+    plan_key = (id(g), len(g))
+    if plan_key in plan_cache and plan_cache[plan_key][0]() is g:     #the id of a deleted graph can be reused
+        plan_cache.move_to_end(plan_key)
+        return plan_cache[plan_key][1]
+
+    plan = compile_mapping_plan(g)
+    plan_cache[plan_key] = (weakref.ref(g), plan)
+    while len(plan_cache) > PLAN_CACHE_SIZE:
+        plan_cache.popitem(last=False)
+
+    return plan
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the delimiter of a csv file (some data sources are tab separated)
+def get_csv_delimiter(file_path):
+
+    with open(file_path, "r", encoding="utf-8-sig", errors="replace") as f:
+        header = f.readline()
+
+    delimiter_counts = {d: header.count(d) for d in (",", ";", "\t", "|")}
+    delimiter = max(delimiter_counts, key=delimiter_counts.get)
+
+    return delimiter if delimiter_counts[delimiter] else ","
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to split a csv file into (about) n byte ranges that start and end at record boundaries
+#quotes are counted from the beginning of the file, so newlines inside quoted values are not boundaries
+#returns (header end, [(start, end)...])
+def get_csv_byte_ranges(file_path, n_ranges):
+
+    file_size = os.path.getsize(file_path)
+    targets = [file_size * k // n_ranges for k in range(n_ranges)]   #first target is the header
+    boundaries = []
+
+    with open(file_path, "rb") as f:
+        offset = 0         #offset of the block in the file
+        quotes = 0         #quotes before the block
+        target_i = 0
+
+        while target_i < len(targets):
+            block = f.read(CSV_SCAN_BLOCK)
+            if not block:
+                break
+
+            search_from = 0
+            while target_i < len(targets) and targets[target_i] < offset + len(block):
+                search_from = max(targets[target_i] - offset, search_from)
+                block_quotes = quotes + block.count(b'"', 0, search_from)
+                newline = block.find(b"\n", search_from)
+                while newline != -1:
+                    block_quotes += block.count(b'"', search_from, newline)
+                    search_from = newline + 1
+                    if block_quotes % 2 == 0:     #not inside a quoted value
+                        break
+                    newline = block.find(b"\n", search_from)
+
+                if newline == -1:    #keep looking in the next block
+                    break
+                boundaries.append(offset + newline + 1)
+                while target_i < len(targets) and targets[target_i] <= offset + newline:
+                    target_i += 1
+
+            quotes += block.count(b'"')
+            offset += len(block)
+
+    if not boundaries:   #only a header (or empty file)
+        return file_size, []
+
+    header_end = boundaries[0]
+    starts = [b for b in boundaries if b < file_size]
+    ranges = list(zip(starts, starts[1:] + [file_size]))
+
+    return header_end, ranges
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#File-like object with the header of a csv file followed by one of its byte ranges
+#so that pandas can parse the range as if it was a whole csv file
+class CSVByteRange(io.RawIOBase):
+
+    def __init__(self, file_path, header_end, start, end):
+        self.f = open(file_path, "rb")
+        self.header = self.f.read(header_end)
+        self.f.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.header:
+            n = min(len(buffer), len(self.header))
+            buffer[:n] = self.header[:n]
+            self.header = self.header[n:]
+            return n
+        data = self.f.read(min(len(buffer), self.remaining))
+        self.remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to read a csv data source in chunks
+#all values are read as strings, only empty cells are null (they generate no terms)
+#byte_range = (header end, start, end) reads only that part of the file (see get_csv_byte_ranges)
+#usecols = columns to parse (None: all), the other columns are skipped without being converted
+def read_csv_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE, byte_range=None, usecols=None):
+
+    if byte_range:
+        source = io.BufferedReader(CSVByteRange(file_path, *byte_range), CSV_SCAN_BLOCK)
+    else:
+        source = file_path
+
+    if usecols is None:
+        column_filter = None
+    elif usecols:
+        usecols_set = set(usecols)
+        column_filter = lambda column: column in usecols_set    #missing columns are reported by check_term_map_columns
+    else:    #no column is referenced (constant terms), but the rows are still needed
+        column_filter = [0]
+
+    reader = pd.read_csv(source, sep=get_csv_delimiter(file_path), dtype=str, usecols=column_filter,
+        keep_default_na=False, na_values=[""], encoding="utf-8-sig", chunksize=chunksize)
+
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+    if byte_range:
+        source.close()
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to parse the rml:iterator of a JSON data source (simple JSONPath: $.a.b[*], $['a'][0]...)
+#returns the list of steps (keys, indexes or "*")
+def parse_jsonpath_iterator(iterator):
+
+    iterator = iterator.strip()
+    if not iterator.startswith("$"):
+        raise ValueError(f"Unsupported JSONPath iterator: {iterator}")
+
+    steps = []
+    for match in re.finditer(r"\.\.|\.([^.\[\]]+)|\[\s*'([^']*)'\s*\]|\[\s*\"([^\"]*)\"\s*\]|\[\s*(\*|-?\d+)\s*\]|(.)", iterator[1:]):
+        if match.group(0) == ".." or match.group(5) is not None:
+            raise ValueError(f"Unsupported JSONPath iterator: {iterator}")
+        key = match.group(1) or match.group(2) or match.group(3)
+        if key is not None:
+            steps.append("*" if key == "*" else key)
+        elif match.group(4) == "*":
+            steps.append("*")
+        else:
+            steps.append(int(match.group(4)))
+
+    return steps
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Text stream of a JSON file that is parsed incrementally (only the buffer is kept in memory)
+#values are decoded one at a time with json.JSONDecoder.raw_decode
+class JSONStream:
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.read_size = JSON_READ_BLOCK
+        self.decoder = json.JSONDecoder()
+
+    def read_more(self):
+        data = self.f.read(self.read_size)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+
+    def peek(self):    #next non-whitespace character ("" at the end of the file)
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self.read_more()
+
+    def next_char(self):
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def expect(self, expected_char):
+        char = self.next_char()
+        if char != expected_char:
+            raise ValueError(f"Invalid JSON: expected '{expected_char}' but found '{char}'")
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.read_more()
+                self.read_size *= 2    #the value is bigger than the buffer
+                continue
+            if end == len(self.buffer) and not self.eof:   #a number could continue in the next block
+                self.read_more()
+                continue
+            self.pos = end
+            self.read_size = JSON_READ_BLOCK
+            return value
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to iterate over the values of a JSON stream that match the iterator steps
+#only the matched values are decoded as a whole, arrays and objects on the path are parsed item by item
+def iter_json_path(stream, steps):
+
+    if not steps:
+        yield stream.decode_value()
+        return
+
+    step = steps[0]
+    char = stream.peek()
+
+    if char == "[":
+        stream.next_char()
+        if stream.peek() == "]":
+            stream.next_char()
+            return
+        index = 0
+        while True:
+            if step == "*" or step == index:
+                yield from iter_json_path(stream, steps[1:])
+            else:
+                stream.decode_value()
+            index += 1
+            char = stream.next_char()
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Invalid JSON: expected ',' or ']' but found '{char}'")
+
+    elif char == "{":
+        stream.next_char()
+        if stream.peek() == "}":
+            stream.next_char()
+            return
+        while True:
+            key = stream.decode_value()
+            stream.expect(":")
+            if step == "*" or step == key:
+                yield from iter_json_path(stream, steps[1:])
+            else:
+                stream.decode_value()
+            char = stream.next_char()
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Invalid JSON: expected ',' or '}}' but found '{char}'")
+
+    else:    #a scalar does not match the remaining steps
+        stream.decode_value()
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to flatten a JSON record into {reference: string value}
+#nested keys are joined with dots (address.city), lists are kept as JSON text
+def flatten_json_record(value, prefix="", record=None):
+
+    record = {} if record is None else record
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten_json_record(item, f"{prefix}{key}" if not prefix else f"{prefix}.{key}", record)
+    elif value is None:
+        record[prefix or "."] = None
+    elif isinstance(value, bool):
+        record[prefix or "."] = "true" if value else "false"
+    elif isinstance(value, list):
+        record[prefix or "."] = json.dumps(value, ensure_ascii=False)
+    else:
+        record[prefix or "."] = str(value)
+
+    return record
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to keep only some references of a record (JSON or XML), usecols=None keeps them all
+def project_record(record, usecols=None):
+
+    if usecols is None:
+        return record
+
+    return {reference: record[reference] for reference in usecols if reference in record}
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to read a JSON data source in chunks
+#the rml:iterator is evaluated while the file is parsed, so the file is never loaded as a whole
+#usecols = references to keep (None: all)
+#without rml:iterator, the records are the items of the root array
+DEFAULT_JSON_ITERATOR = "$[*]"
+
+def read_json_chunks(file_path, iterator=None, chunksize=DEFAULT_CHUNKSIZE, usecols=None):
+
+    steps = parse_jsonpath_iterator(iterator or DEFAULT_JSON_ITERATOR)
+    records = []
+
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        for value in iter_json_path(JSONStream(f), steps):
+            records.append(project_record(flatten_json_record(value), usecols))
+            if len(records) >= chunksize:
+                yield pd.DataFrame(records)
+                records = []
+
+    if records:
+        yield pd.DataFrame(records)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to parse the rml:iterator of an XML data source (simple XPath: /a/b, //b, /a/*/c)
+#returns (absolute, [local names])
+def parse_xpath_iterator(iterator):
+
+    iterator = iterator.strip()
+    if re.search(r"[\[\]()@|=]", iterator) or not iterator.strip("/"):
+        raise ValueError(f"Unsupported XPath iterator: {iterator}")
+
+    absolute = not iterator.startswith("//")
+    steps = [step.split(":")[-1] for step in iterator.strip("/").split("/")]
+    if "" in steps:
+        raise ValueError(f"Unsupported XPath iterator: {iterator}")
+
+    return absolute, steps
+
+def xpath_matches(path, absolute, steps):
+
+    if absolute and len(path) != len(steps):
+        return False
+    if len(path) < len(steps):
+        return False
+    return all(step in ("*", name) for step, name in zip(steps, path[len(path) - len(steps):]))
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the local name of an XML tag or attribute ({namespace}name -> name)
+def get_xml_local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to flatten an XML element into {reference: string value}
+#references are relative XPaths: text() (or .), @attribute, child, child/grandchild, child/@attribute
+#(only the first value of repeated children is kept)
+def get_xml_record(element):
+
+    record = {}
+    text = (element.text or "").strip()
+    record["text()"] = record["."] = text or None
+    for attribute, value in element.attrib.items():
+        record["@" + get_xml_local_name(attribute)] = value
+
+    stack = [(child, "") for child in reversed(element)]
+    while stack:
+        child, prefix = stack.pop()
+        name = prefix + get_xml_local_name(child.tag)
+        if name not in record:
+            record[name] = (child.text or "").strip() or None
+            for attribute, value in child.attrib.items():
+                record[f"{name}/@{get_xml_local_name(attribute)}"] = value
+        stack += [(grandchild, name + "/") for grandchild in reversed(child)]
+
+    return record
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to read an XML data source in chunks (iterative parsing)
+#only the element being matched by the rml:iterator is kept in memory: every finished element
+#is cleared and removed from its parent, so memory does not grow with the size of the file
+#usecols = references to keep (None: all)
+#without rml:iterator, the records are the children of the root element (as JSON sources default to $[*])
+DEFAULT_XML_ITERATOR = "/*/*"
+
+def read_xml_chunks(file_path, iterator=None, chunksize=DEFAULT_CHUNKSIZE, usecols=None):
+
+    absolute, steps = parse_xpath_iterator(iterator or DEFAULT_XML_ITERATOR)
+
+    path = []         #local names of the open elements
+    elements = []     #open elements
+    match_depth = None
+    records = []
+
+    for event, element in ElementTree.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            path.append(get_xml_local_name(element.tag))
+            elements.append(element)
+            if match_depth is None and xpath_matches(path, absolute, steps):
+                match_depth = len(path)
+            continue
+
+        if match_depth == len(path):
+            records.append(project_record(get_xml_record(element), usecols))
+            match_depth = None
+            if len(records) >= chunksize:
+                yield pd.DataFrame(records)
+                records = []
+
+        if match_depth is None:    #element finished and not needed anymore
+            element.clear()
+            if len(elements) > 1:
+                elements[-2].remove(element)
+        path.pop()
+        elements.pop()
+
+    if records:
+        yield pd.DataFrame(records)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the pandas type of the string columns of parquet chunks: str columns that use the arrow memory,
+#with NaN for nulls (as pd.read_csv with dtype=str), which needs pandas >= 2.3
+#with older versions it is None: pyarrow copies the strings into object columns (with None for nulls)
+@functools.cache
+def get_parquet_string_dtype():
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        return None
+
+#Function to convert the arrow type of a column into the pandas type of the chunks (None: default conversion)
+def get_parquet_pandas_type(arrow_type):
+    return get_parquet_string_dtype() if arrow_type == pa.string() else None
+
+#Function to convert a batch of a parquet file into a chunk of the data source (all the values are strings,
+#as in csv data sources, nulls are NaN)
+#string columns are not copied: the pandas columns use the arrow memory of the batch
+def get_parquet_chunk(batch):
+
+    arrays = [array if array.type == pa.string() else pc.cast(array, pa.string()) for array in batch.columns]
+    batch = pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+    return batch.to_pandas(types_mapper=get_parquet_pandas_type)
+
+#Function to find the row groups of a parquet file that can generate triples
+#subject_columns is a list of lists of columns (the references of the subject of each TriplesMap)
+#a row group is skipped if, for each list, one of its columns only has nulls in the row group
+#(by the statistics of the file, the row group is not read: it generates no subject, so no triples)
+#returns the list of row group indexes
+def get_parquet_row_groups(parquet_file, subject_columns=None):
+
+    metadata = parquet_file.metadata
+    column_index_dict = {metadata.schema.column(i).name: i for i in range(metadata.num_columns)}
+
+    row_group_list = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        if subject_columns and all(any(is_null_parquet_column(row_group, column_index_dict.get(column))
+            for column in columns) for columns in subject_columns):
+            continue
+        row_group_list.append(i)
+
+    return row_group_list
+
+#Function to check whether a column of a row group only has nulls (False if there are no statistics)
+def is_null_parquet_column(row_group, column_index):
+
+    if column_index is None:
+        return False
+    statistics = row_group.column(column_index).statistics
+
+    return statistics is not None and statistics.has_null_count and statistics.null_count == row_group.num_rows
+
+#Function to get the columns of a parquet data source (only the schema is read)
+#without pyarrow the columns are unknown (the app still lets the user write the references)
+def get_parquet_column_list(file_path):
+    return pq.read_schema(file_path).names if pa is not None else []
+
+#Function to read a parquet data source in chunks of arrow record batches (one row group at a time)
+#only the columns in usecols are read (None: all), and the row groups without subjects are skipped
+#(see get_parquet_row_groups)
+def read_parquet_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE, usecols=None, subject_columns=None):
+
+    if pa is None:
+        raise ValueError(f"The pyarrow package is needed to read parquet data sources ({os.path.basename(file_path)})")
+
+    with pq.ParquetFile(file_path) as parquet_file:
+        columns = parquet_file.schema_arrow.names
+        if usecols is not None:
+            usecols_set = set(usecols)    #missing columns are reported by check_term_map_columns
+            columns = [column for column in columns if column in usecols_set] or columns[:1]   #(rows still needed)
+
+        row_group_list = get_parquet_row_groups(parquet_file, subject_columns)
+        if not row_group_list:
+            return
+
+        for batch in parquet_file.iter_batches(batch_size=chunksize, row_groups=row_group_list, columns=columns):
+            yield get_parquet_chunk(batch)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#SQLITE DATA SOURCES
+#the projection (only the referenced columns) and a filter (rows without subject generate no triples) are
+#pushed into the SQL query, and the rows are fetched in batches (fetchmany) from a read-only connection
+#that is kept open for the next reads of the same database (one pool per process)
+#the connection is opened again if the database file changes (e.g. it is replaced by a new version)
+sqlite_connection_dict = {}     #{(process id, database path): (stat of the file, connection)}
+
+#Function to get the stat of a file that tells whether it has changed (inode, modification time and size)
+def get_file_stat_key(file_path):
+    file_stat = os.stat(file_path)
+    return (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+
+#Function to get the read-only connection to a SQLite database (opened the first time, or if the file has changed)
+#the old connection is not closed, because a cursor may still be reading from it (it is closed when it is no longer used)
+def get_sqlite_connection(file_path):
+
+    if not os.path.isfile(file_path):
+        raise ValueError(f"SQLite database not found: {file_path}")
+
+    key = (os.getpid(), os.path.abspath(file_path))    #connections cannot be shared with forked processes
+    stat_key = get_file_stat_key(file_path)
+    if key not in sqlite_connection_dict or sqlite_connection_dict[key][0] != stat_key:
+        database_uri = "file:" + urllib.parse.quote(os.path.abspath(file_path).replace(os.sep, "/")) + "?mode=ro"
+        sqlite_connection_dict[key] = (stat_key, sqlite3.connect(database_uri, uri=True, check_same_thread=False))
+
+    return sqlite_connection_dict[key][1]
+
+def quote_sql_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+#Function to get the FROM clause of a SQLite logical source (rml:query as a subquery, or rr:tableName)
+def get_sqlite_from_clause(table=None, query=None):
+
+    if query:
+        return f"({query.strip().rstrip(';')})"
+    if table:
+        return quote_sql_identifier(table)
+
+    raise ValueError("SQLite data sources need a table (rr:tableName) or a query (rml:query)")
+
+#Function to get the tables and views of a SQLite database
+def get_sqlite_table_list(file_path):
+
+    cursor = get_sqlite_connection(file_path).execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name")
+    try:
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+#Function to get the columns of a table or query of a SQLite database (no row is read)
+def get_sqlite_column_list(file_path, table=None, query=None):
+
+    cursor = get_sqlite_connection(file_path).execute(f"SELECT * FROM {get_sqlite_from_clause(table, query)} LIMIT 0")
+    try:
+        return [column[0] for column in cursor.description]
+    finally:
+        cursor.close()
+
+#Function to get the query that reads a table or query of a SQLite database
+#only the columns in usecols are selected (None: all), as text (as in csv data sources)
+#subject_columns is a list of lists of columns (the references of the subject of each TriplesMap): only the rows
+#where all the columns of one of the lists are not null are selected
+#skip_rows = selected rows that are skipped (to resume a run, see MaterializationCheckpoint)
+def get_sqlite_select(column_list, table=None, query=None, usecols=None, subject_columns=None, skip_rows=0):
+
+    if usecols is not None:
+        usecols_set = set(usecols)    #missing columns are reported by check_term_map_columns
+        column_list = [column for column in column_list if column in usecols_set] or column_list[:1]   #(rows still needed)
+    select = ", ".join(f"CAST({quote_sql_identifier(column)} AS TEXT) AS {quote_sql_identifier(column)}"
+        for column in column_list)
+    sql = f"SELECT {select} FROM {get_sqlite_from_clause(table, query)}"
+
+    #no filter if a TriplesMap has a constant subject (or a subject column is missing, reported later)
+    if subject_columns and all(columns and all(column in column_list for column in columns) for columns in subject_columns):
+        conditions = [" AND ".join(f"{quote_sql_identifier(column)} IS NOT NULL" for column in columns)
+            for columns in subject_columns]
+        sql += " WHERE " + " OR ".join(f"({condition})" for condition in dict.fromkeys(conditions))
+    if skip_rows:
+        sql += f" LIMIT -1 OFFSET {int(skip_rows)}"
+
+    return sql, column_list
+
+#Function to read a table or query of a SQLite database in chunks (see get_sqlite_select)
+def read_sqlite_chunks(file_path, table=None, query=None, chunksize=DEFAULT_CHUNKSIZE, usecols=None, subject_columns=None,
+    skip_rows=0):
+
+    connection = get_sqlite_connection(file_path)
+    sql, column_list = get_sqlite_select(get_sqlite_column_list(file_path, table, query), table, query,
+        usecols, subject_columns, skip_rows)
+
+    cursor = connection.execute(sql)
+    try:
+        while rows := cursor.fetchmany(chunksize):
+            yield pd.DataFrame.from_records(rows, columns=column_list)
+    finally:
+        cursor.close()
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the full path of the data source of a TriplesMap
+def get_source_path(rules, ds_folder=None):
+
+    if not rules["source"]:
+        raise ValueError(f"TriplesMap {rules['label']} has no data source")
+
+    ds_folder = ds_folder or get_ds_folder_path()
+    return os.path.join(ds_folder, rules["source"])
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to check whether the data source of a TriplesMap is a csv file
+def is_csv_source(rules):
+    file_extension = (rules["source"] or "").rsplit(".", 1)[-1].lower()
+    return (rules["reference_formulation"] == "CSV" or file_extension == "csv") and not is_parquet_source(rules)
+
+#Function to check whether the data source of a TriplesMap is a parquet file
+def is_parquet_source(rules):
+    file_extension = (rules["source"] or "").rsplit(".", 1)[-1].lower()
+    return rules["reference_formulation"] == "Parquet" or file_extension == "parquet"
+
+#Function to check whether the data source of a TriplesMap is a SQLite database
+def is_sqlite_source(rules):
+    file_extension = (rules["source"] or "").rsplit(".", 1)[-1].lower()
+    return rules["reference_formulation"] == "SQL2008" or file_extension in SQLITE_EXTENSIONS
+
+#Function to check whether the data source of a TriplesMap is a table (csv or parquet file, SQLite table or query)
+#(a referenced column that does not exist is an error, and the iterator is ignored)
+def is_tabular_source(rules):
+    return is_csv_source(rules) or is_parquet_source(rules) or is_sqlite_source(rules)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to skip the first rows of a sequence of chunks
+#(the rows are still parsed: csv files can have blank lines and records on several lines, so rows cannot be
+#skipped by line number)
+def skip_chunk_rows(chunks, skip_rows):
+
+    try:
+        for chunk in chunks:
+            if skip_rows >= len(chunk):
+                skip_rows -= len(chunk)
+                continue
+            if skip_rows:
+                chunk = chunk.iloc[skip_rows:].reset_index(drop=True)
+                skip_rows = 0
+            yield chunk
+    finally:
+        chunks.close()
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to read the data source of a TriplesMap in chunks
+#usecols = columns to read (None: all), e.g. rules["columns"]
+#subject_columns = lists of columns that must not be null to generate triples (see get_parquet_row_groups)
+#skip_rows = rows that are skipped (the rows already materialized by an interrupted run)
+def read_source_chunks(rules, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, byte_range=None, usecols=None,
+    subject_columns=None, skip_rows=0):
+
+    file_path = get_source_path(rules, ds_folder)
+
+    if is_parquet_source(rules):
+        chunks = read_parquet_chunks(file_path, chunksize, usecols, subject_columns)
+    elif is_sqlite_source(rules):
+        return read_sqlite_chunks(file_path, rules["table"], rules["query"], chunksize, usecols, subject_columns, skip_rows)
+    elif is_csv_source(rules):
+        chunks = read_csv_chunks(file_path, chunksize, byte_range, usecols)
+    elif rules["reference_formulation"] == "JSONPath" or file_path.lower().endswith(".json"):
+        chunks = read_json_chunks(file_path, rules["iterator"], chunksize, usecols)
+    elif rules["reference_formulation"] == "XPath" or file_path.lower().endswith(".xml"):
+        chunks = read_xml_chunks(file_path, rules["iterator"], chunksize, usecols)
+    else:
+        raise ValueError(f"Unsupported data source for TriplesMap {rules['label']}: {rules['source']}")
+
+    return skip_chunk_rows(chunks, skip_rows) if skip_rows else chunks
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to compile an rr:template into its literal parts and its references
+#"http://ex.org/{a}/{b}" -> {"literals": ["http://ex.org/", "/", ""], "references": ["a", "b"]}
+#there is always one literal part more than references (\{ and \} are escaped curly braces)
+def compile_template(template):
+
+    literals = []
+    references = []
+    current = ""
+    i = 0
+
+    while i < len(template):
+        char = template[i]
+        if char == "\\" and i + 1 < len(template):   #escaped character
+            current += template[i + 1]
+            i += 2
+            continue
+        if char == "{":
+            end = template.find("}", i)
+            if end == -1:
+                raise ValueError(f"Unclosed reference in template {template}")
+            literals.append(current)
+            references.append(template[i + 1:end])
+            current = ""
+            i = end + 1
+            continue
+        current += char
+        i += 1
+
+    literals.append(current)
+
+    return {"literals": literals, "references": references}
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to percent-encode the values inserted in IRI templates (IRI-safe version, R2RML)
+#only the values with unsafe characters are encoded (each distinct value once)
+#the safe characters are the unreserved characters of RFC 3987 (iunreserved): ASCII letters, digits, -._~ and the
+#ucschar ranges, also outside the BMP (planes 1 to 13 without their last two code points, and E1000-EFFFD)
+#the ranges are written as the characters themselves, because the regex engine of pyarrow (used by the
+#arrow-backed string columns of pandas) does not accept \u escapes
+IRI_UCSCHAR_RANGES = [(0xA0, 0xD7FF), (0xF900, 0xFDCF), (0xFDF0, 0xFFEF)] + \
+    [(plane * 0x10000, plane * 0x10000 + 0xFFFD) for plane in range(1, 14)] + [(0xE1000, 0xEFFFD)]
+IRI_UNSAFE_CHARS = re.compile("[^A-Za-z0-9\\-._~"
+    + "".join(f"{chr(start)}-{chr(end)}" for start, end in IRI_UCSCHAR_RANGES) + "]")
+
+def percent_encode(value):
+    return IRI_UNSAFE_CHARS.sub(lambda m: "".join(f"%{b:02X}" for b in m.group().encode("utf-8")), value)
+
+def get_iri_safe_values(values):
+
+    unsafe = values.str.contains(IRI_UNSAFE_CHARS, na=False)
+    if not unsafe.any():
+        return values
+
+    values = values.astype(object)
+    unsafe_values = pd.unique(values[unsafe])
+    encoded_dict = {v: percent_encode(v) for v in unsafe_values}
+    values[unsafe] = values[unsafe].map(encoded_dict)
+
+    return values
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to expand a compiled template for a whole chunk (column at a time)
+#returns a Series aligned with the chunk (null if any referenced value is null)
+def expand_template(compiled_template, chunk, iri_safe=True):
+
+    literals = compiled_template["literals"]
+    references = compiled_template["references"]
+
+    if not references:
+        return pd.Series(literals[0], index=chunk.index, dtype=object)
+
+    values = pd.Series(literals[0], index=chunk.index, dtype=object)
+    for reference, literal in zip(references, literals[1:]):
+        column = chunk[reference]
+        if iri_safe:
+            column = get_iri_safe_values(column)
+        values = values + column.astype(object)
+        if literal:
+            values = values + literal
+
+    return values
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Functions to encode terms as N-Triples
+def encode_iri(iri):
+    return f"<{iri}>"
+
+def encode_blank_node(label):
+    return "_:" + re.sub(r"[^A-Za-z0-9_\-]", "_", label)
+
+def encode_literal(value, datatype=None, language=None):
+    value = (value.replace("\\", "\\\\").replace("\"", "\\\"")
+        .replace("\n", "\\n").replace("\r", "\\r"))
+    if language:
+        return f"\"{value}\"@{language}"
+    if datatype:
+        return f"\"{value}\"^^<{datatype}>"
+    return f"\"{value}\""
+
+def encode_term(value, term_map):
+    if term_map["term_type"] == "Literal":
+        return encode_literal(value, term_map["datatype"], term_map["language"])
+    if term_map["term_type"] == "BlankNode":
+        return encode_blank_node(value)
+    return encode_iri(value)
+
+#same as encode_term, for a whole Series of values (nulls are kept)
+def encode_terms(values, term_map):
+
+    values = values.astype(object)
+
+    if term_map["term_type"] == "Literal":
+        for char, escaped_char in (("\\", "\\\\"), ("\"", "\\\""), ("\n", "\\n"), ("\r", "\\r")):
+            values = values.str.replace(char, escaped_char, regex=False)
+        if term_map["language"]:
+            return "\"" + values + f"\"@{term_map['language']}"
+        if term_map["datatype"]:
+            return "\"" + values + f"\"^^<{term_map['datatype']}>"
+        return "\"" + values + "\""
+
+    if term_map["term_type"] == "BlankNode":
+        return "_:" + values.str.replace(r"[^A-Za-z0-9_\-]", "_", regex=True)
+
+    return "<" + values + ">"
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the columns referenced by a term map
+def get_term_map_references(term_map):
+
+    if term_map["type"] == "template":
+        return list(term_map["template"]["references"])
+    if term_map["type"] == "reference":
+        return [term_map["value"]]
+
+    return []
+
+#Function to get the columns of the data source referenced by a TriplesMap (without its joins)
+#ordered as they appear in the rules, without repetitions
+def get_triplesmap_references(rules):
+
+    term_map_list = [rules["subject"]] if rules["subject"] else []
+    term_map_list += [graph for graph in rules["graphs"] if isinstance(graph, dict)]
+    for pom in rules["predicate_object_maps"]:
+        term_map_list += list(pom["predicates"]) + list(pom["objects"])
+        term_map_list += [graph for graph in pom["graphs"] if isinstance(graph, dict)]
+        term_map_list += [ref_object["parent_subject"] for ref_object in pom["referencing_objects"]
+            if not ref_object["join_conditions"] and ref_object["parent_subject"]]
+
+    references = []
+    for term_map in term_map_list:
+        references += [r for r in get_term_map_references(term_map) if r not in references]
+
+    return references
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to check whether a predicate and an object map generate the same triple for every row of a subject
+#(rr:class assertions and constant predicate with constant object, in constant graphs)
+def is_subject_triple(predicate_map, object_map, graph_list):
+    return predicate_map["type"] == "constant" and object_map["type"] == "constant" and has_constant_graphs(graph_list)
+
+#Function to get the triples of a TriplesMap that only depend on the subject
+#they are generated once for each distinct subject instead of once for each row (see get_chunk_term_triples)
+#(rr:class assertions are only subject triples if the graphs of the subject map are constant)
+#returns a list of encoded (predicate, object, graph), without repetitions
+def get_subject_triples(rules):
+
+    subject_triples = []
+    if has_constant_graphs(rules["graphs"]):
+        subject_triples = [(encode_iri(RDF.type), encode_iri(subject_class), graph)
+            for subject_class in rules["classes"] for graph in rules["graphs"]]
+    for pom in rules["predicate_object_maps"]:
+        for predicate_map in pom["predicates"]:
+            for object_map in pom["objects"]:
+                if is_subject_triple(predicate_map, object_map, pom["graphs"]):
+                    for graph in pom["graphs"]:
+                        subject_triple = (encode_term(predicate_map["value"], predicate_map),
+                            encode_term(object_map["value"], object_map), graph)
+                        if subject_triple not in subject_triples:
+                            subject_triples.append(subject_triple)
+
+    return subject_triples
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to check that the columns referenced by a term map exist in the data source
+#a missing column is an error in csv files, but in other formats (JSON...) it just means no value
+#returns True if all the referenced columns exist
+def check_term_map_columns(term_map, columns, rules):
+
+    for reference in get_term_map_references(term_map):
+        if reference not in columns:
+            if is_tabular_source(rules):
+                raise ValueError(f"Column {reference} (TriplesMap {rules['label']}) not found in {rules['source']}")
+            return False
+
+    return True
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to generate the (encoded) terms of a term map for a chunk of the data source
+#returns a Series aligned with the chunk (null where no term is generated)
+def generate_terms(term_map, chunk, rules):
+
+    if not check_term_map_columns(term_map, chunk.columns, rules):
+        return pd.Series(None, index=chunk.index, dtype=object)
+
+    if term_map["type"] == "constant":
+        return pd.Series(encode_term(term_map["value"], term_map), index=chunk.index, dtype=object)
+
+    if term_map["type"] == "reference":
+        return encode_terms(chunk[term_map["value"]], term_map)
+
+    values = expand_template(term_map["template"], chunk, iri_safe=(term_map["term_type"] == "IRI"))
+    return encode_terms(values, term_map)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to generate the graph terms of a list of graphs for a chunk of the data source
+#returns a list with None (default graph), the encoded constant graph, or a Series aligned with the chunk
+def generate_graph_terms(graph_list, chunk, rules):
+    return [generate_terms(graph, chunk, rules) if isinstance(graph, dict) else graph for graph in graph_list]
+
+#Function to get the triple rules of some terms in each of the given graph terms (see generate_graph_terms)
+#the rows where a graph map generates no graph term generate no triple in that graph
+#returns a list of (subjects, predicates, objects, graphs)
+def get_graph_term_triples(subjects, predicates, objects, graph_terms):
+
+    term_triples = []
+    for graphs in graph_terms:
+        if isinstance(graphs, pd.Series):
+            term_triples.append((subjects.where(graphs.notna()), predicates, objects, graphs))
+        else:
+            term_triples.append((subjects, predicates, objects, graphs))
+
+    return term_triples
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to interleave the terms of several triple rules row by row
+#term_triples is a list of (subjects, predicates, objects, graphs), all aligned with the same rows
+#(graphs is None for the default graph, an encoded graph term for all the rows, or aligned with the rows)
+#returns the subjects, predicates, objects and graphs arrays (all the triples of the first row, then the second row...)
+#graphs is None if all the triples are in the default graph
+def get_row_major_terms(term_triples):
+
+    terms = tuple(np.column_stack([np.asarray(term_triple[i], dtype=object) for term_triple in term_triples]).ravel()
+        for i in range(3))
+    if all(term_triple[3] is None for term_triple in term_triples):
+        return terms + (None,)
+
+    n_rows = len(term_triples[0][0])
+    graphs = np.column_stack([np.full(n_rows, term_triple[3], dtype=object) if term_triple[3] is None
+        or isinstance(term_triple[3], str) else np.asarray(term_triple[3], dtype=object)
+        for term_triple in term_triples]).ravel()
+
+    return terms + (graphs,)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to find the rows of a chunk where a subject appears for the first time
+#seen_subjects_dict = {TriplesMap label: sorted 64-bit hashes of the subjects of the previous chunks (uint64 array)},
+#shared by the TriplesMaps of a scan and updated with the new subjects of label (None to only look at the chunk)
+#all the hashes share SEEN_SUBJECTS_MEMORY: when it is full, the hashes of label are emptied (and those of the other
+#TriplesMaps if that is not enough), then some subject triples may be repeated, but never lost
+#(unless two subjects have the same 64-bit hash, which is negligible)
+#returns a boolean array aligned with the chunk
+def get_new_subject_rows(subjects, seen_subjects_dict=None, label=None):
+
+    new_rows = np.array(subjects.notna() & ~subjects.duplicated(), dtype=bool)
+    if seen_subjects_dict is None:
+        return new_rows
+
+    row_positions = np.flatnonzero(new_rows)
+    hashes = pd.util.hash_array(subjects.to_numpy(dtype=object)[row_positions])
+    seen_subjects = seen_subjects_dict[label]
+    if len(seen_subjects):
+        positions = np.searchsorted(seen_subjects, hashes)
+        is_new = seen_subjects[np.minimum(positions, len(seen_subjects) - 1)] != hashes
+        new_rows[row_positions[~is_new]] = False
+        hashes = hashes[is_new]
+
+    hashes = np.unique(hashes)
+    if get_seen_subjects_memory(seen_subjects_dict) + hashes.nbytes > SEEN_SUBJECTS_MEMORY:
+        seen_subjects_dict[label] = seen_subjects = get_empty_seen_subjects()
+        if get_seen_subjects_memory(seen_subjects_dict) + hashes.nbytes > SEEN_SUBJECTS_MEMORY:
+            for tmap_label in seen_subjects_dict:
+                seen_subjects_dict[tmap_label] = get_empty_seen_subjects()
+    seen_subjects_dict[label] = np.insert(seen_subjects, np.searchsorted(seen_subjects, hashes), hashes)
+
+    return new_rows
+
+def get_empty_seen_subjects():
+    return np.zeros(0, dtype=np.uint64)
+
+def get_seen_subjects_memory(seen_subjects_dict):
+    return sum(seen_subjects.nbytes for seen_subjects in seen_subjects_dict.values())
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to generate the terms of the triple rules of a TriplesMap for a chunk of the data source
+#the subject triples (rr:class, constant predicate and object) are only generated in the first row of each subject
+#(see get_new_subject_rows)
+#with quads=True, each triple rule is generated in each of its graphs (rr:graph / rr:graphMap), otherwise
+#the graphs are ignored (N-Triples output)
+#returns a list of (subjects, predicates, objects, graphs), all aligned with the chunk (one per triple rule and graph)
+def get_chunk_term_triples(rules, chunk, seen_subjects_dict=None, quads=False):
+
+    subjects = generate_terms(rules["subject"], chunk, rules)
+    if subjects.isna().all():
+        return []
+
+    term_triples = []     #(subjects, predicates, objects, graphs) aligned with the chunk, one per triple rule and graph
+
+    if rules["subject_triples"]:
+        new_subjects = subjects.where(get_new_subject_rows(subjects, seen_subjects_dict, rules["label"]))
+        subject_triples = rules["subject_triples"] if quads else \
+            list(dict.fromkeys((predicate, subject_object, None) for predicate, subject_object, graph in rules["subject_triples"]))
+        for predicate, subject_object, graph in subject_triples:
+            term_triples.append((new_subjects, np.full(len(chunk), predicate, dtype=object),
+                np.full(len(chunk), subject_object, dtype=object), graph))
+
+    if rules["classes"] and not has_constant_graphs(rules["graphs"]):    #(not in the subject triples)
+        graph_terms = generate_graph_terms(rules["graphs"] if quads else [None], chunk, rules)
+        predicates = np.full(len(chunk), encode_iri(RDF.type), dtype=object)
+        for subject_class in rules["classes"]:
+            objects = np.full(len(chunk), encode_iri(subject_class), dtype=object)
+            term_triples += get_graph_term_triples(subjects, predicates, objects, graph_terms)
+
+    for pom in rules["predicate_object_maps"]:
+        graph_terms = generate_graph_terms(pom["graphs"] if quads else [None], chunk, rules)
+        for predicate_map in pom["predicates"]:
+            predicates = generate_terms(predicate_map, chunk, rules)
+            for object_map in pom["objects"]:
+                if not is_subject_triple(predicate_map, object_map, pom["graphs"]):    #(the others are in the subject triples)
+                    term_triples += get_graph_term_triples(subjects, predicates,
+                        generate_terms(object_map, chunk, rules), graph_terms)
+            for ref_object in pom["referencing_objects"]:    #without join condition: same row of the same source
+                if not ref_object["join_conditions"] and ref_object["parent_subject"]:
+                    objects = generate_terms(ref_object["parent_subject"], chunk, ref_object["parent_source"])
+                    term_triples += get_graph_term_triples(subjects, predicates, objects, graph_terms)
+
+    return term_triples
+
+#Function to count the triples of a list of (subjects, predicates, objects, graphs) (rows without null terms)
+def count_term_triples(term_triples):
+    return int(sum((pd.notna(subjects) & pd.notna(predicates) & pd.notna(objects)).sum()
+        for subjects, predicates, objects, graphs in term_triples))
+
+#Function to materialize a chunk of the data source
+#the triples are written row by row (all the triples of a row together), so the output does not
+#depend on how the data source is split into chunks or byte ranges
+#returns the encoded subjects, predicates, objects (nulls mean no triple) and graphs (see get_row_major_terms),
+#or None if there are no triples
+def materialize_chunk(rules, chunk, quads=False):
+
+    term_triples = get_chunk_term_triples(rules, chunk, quads=quads)
+    if not term_triples:
+        return None
+
+    return get_row_major_terms(term_triples)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to read the first rows of the data source of a TriplesMap (None if it is empty)
+def read_source_head(rules, n_rows, ds_folder=None):
+
+    chunks = read_source_chunks(rules, ds_folder, n_rows)
+    try:
+        return next(chunks, None)
+    finally:
+        chunks.close()
+
+#Function to preview the triples generated by a TriplesMap on some rows of its data source
+#(the triples of the joins are not included)
+#returns a DataFrame with the encoded terms, in the columns Subject, Predicate, Object
+def preview_triplesmap(rules, rows):
+
+    chunk_terms = None
+    if rules and rules["subject"] and rows is not None and len(rows):
+        chunk_terms = materialize_chunk(rules, rows)
+
+    if not chunk_terms:
+        return pd.DataFrame(columns=["Subject", "Predicate", "Object"])
+
+    preview_df = pd.DataFrame({"Subject": chunk_terms[0], "Predicate": chunk_terms[1], "Object": chunk_terms[2]})
+    return preview_df.dropna().reset_index(drop=True)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to read one side of a join in chunks
+#yields DataFrames with the join keys (k0, k1...), the term of the side ("term") and
+#the extra term maps evaluated on the same rows (e.g. the predicates of the child side: p0, p1...)
+def read_join_side_frames(side_rules, term_map, key_columns, extra_term_maps, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE):
+
+    usecols = list(key_columns)
+    for side_term_map in [term_map] + list(extra_term_maps):
+        usecols += [r for r in get_term_map_references(side_term_map) if r not in usecols]
+
+    subject_columns = [list(key_columns) + get_term_map_references(term_map)]    #rows without them are dropped
+    for chunk in read_source_chunks(side_rules, ds_folder, chunksize, usecols=usecols, subject_columns=subject_columns):
+        for column in key_columns:
+            if column not in chunk.columns:
+                if is_tabular_source(side_rules):
+                    raise ValueError(f"Join column {column} (TriplesMap {side_rules['label']}) not found in {side_rules['source']}")
+                chunk = chunk.assign(**{column: None})    #no value in this chunk (e.g. JSON)
+
+        frame = pd.DataFrame({f"k{i}": chunk[column].astype(object) for i, column in enumerate(key_columns)}, index=chunk.index)
+        frame["term"] = generate_terms(term_map, chunk, side_rules)
+        for i, extra_term_map in enumerate(extra_term_maps):
+            frame[f"p{i}"] = generate_terms(extra_term_map, chunk, side_rules)
+
+        yield frame.dropna(subset=[c for c in frame.columns if not c.startswith("p")])
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to write the triples of the joined rows (child "term" as subject, parent "term" as object)
+#in each of the graphs of graph_list (the graph maps with templates or references are the extra
+#columns of the child side after the predicates, see materialize_join)
+#returns the number of triples written
+def write_join_triples(joined, n_predicates, writer, graph_list=(None,)):
+
+    if joined.empty:
+        return 0
+
+    graph_terms = []
+    n_graph_maps = 0
+    for graph in graph_list:
+        if isinstance(graph, dict):
+            graph_terms.append(joined[f"p{n_predicates + n_graph_maps}"])
+            n_graph_maps += 1
+        else:
+            graph_terms.append(graph)
+
+    term_triples = []
+    for i in range(n_predicates):
+        term_triples += get_graph_term_triples(joined["term_child"], joined[f"p{i}"], joined["term_parent"], graph_terms)
+
+    return writer.write_batch(*get_row_major_terms(term_triples))
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to join a probe frame with the build side (a hash join, done by pandas merge)
+def join_frames(probe_frame, build_frame, key_names, build_is_parent):
+
+    if build_is_parent:
+        return probe_frame.merge(build_frame, on=key_names, how="inner", suffixes=("_child", "_parent"))
+    return probe_frame.merge(build_frame, on=key_names, how="inner", suffixes=("_parent", "_child"))
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to partition frames on disk by the hash of their join keys (spill to disk)
+#partition_files is a list of open binary files (one per partition)
+def spill_join_frame(frame, key_names, partition_files):
+
+    if frame.empty:
+        return
+    partition_ids = pd.util.hash_pandas_object(frame[key_names], index=False).to_numpy() % len(partition_files)
+    for partition_id, partition_frame in frame.groupby(partition_ids, sort=False):
+        pickle.dump(partition_frame, partition_files[partition_id], pickle.HIGHEST_PROTOCOL)
+
+def read_spilled_frames(partition_path):
+    with open(partition_path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to materialize a referencing object map with join conditions
+#hash join: the smaller data source (child or parent) is the build side and the other one is streamed
+#if the build side does not fit in join_memory (bytes), both sides are partitioned on disk by the hash of
+#their join keys and the partitions are joined one at a time (grace hash join)
+#the triples are written in each of the graphs of graph_list (see get_graph_maps)
+#returns the number of triples written
+def materialize_join(rules, predicate_maps, ref_object, writer, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, join_memory=DEFAULT_JOIN_MEMORY,
+    graph_list=(None,)):
+
+    parent_source = ref_object["parent_source"]
+    if not ref_object["parent_subject"]:   #parent TriplesMap without Subject Map
+        return 0
+
+    key_names = [f"k{i}" for i in range(len(ref_object["join_conditions"]))]
+    graph_maps = [graph for graph in graph_list if isinstance(graph, dict)]    #evaluated on the child rows
+    child_side = (rules, rules["subject"], [c["child"] for c in ref_object["join_conditions"]],
+        list(predicate_maps) + graph_maps)
+    parent_side = (parent_source, ref_object["parent_subject"], [c["parent"] for c in ref_object["join_conditions"]], [])
+
+    child_size = os.path.getsize(get_source_path(rules, ds_folder))
+    parent_size = os.path.getsize(get_source_path(parent_source, ds_folder))
+    build_is_parent = parent_size <= child_size
+    build_side, probe_side = (parent_side, child_side) if build_is_parent else (child_side, parent_side)
+
+    n_triples = 0
+    build_frames = []
+    build_bytes = 0
+    build_frame_iterator = read_join_side_frames(*build_side, ds_folder, chunksize)
+
+    for frame in build_frame_iterator:
+        build_frames.append(frame)
+        build_bytes += frame.memory_usage(deep=True).sum()
+        if build_bytes > join_memory:    #build side does not fit in memory
+            n_partitions = min(JOIN_MAX_PARTITIONS, max(JOIN_MIN_PARTITIONS,
+                math.ceil(4 * max(parent_size, child_size) / join_memory)))
+            spill_folder = tempfile.mkdtemp(prefix=".rdfolio_join_",
+                dir=os.path.dirname(os.path.abspath(writer.output_path)))
+            try:
+                build_paths = [os.path.join(spill_folder, f"build_{i}.pkl") for i in range(n_partitions)]
+                probe_paths = [os.path.join(spill_folder, f"probe_{i}.pkl") for i in range(n_partitions)]
+
+                build_files = [open(path, "wb") for path in build_paths]
+                for build_frame in build_frames:
+                    spill_join_frame(build_frame, key_names, build_files)
+                build_frames = []
+                for build_frame in build_frame_iterator:
+                    spill_join_frame(build_frame, key_names, build_files)
+                for partition_file in build_files:
+                    partition_file.close()
+
+                probe_files = [open(path, "wb") for path in probe_paths]
+                for probe_frame in read_join_side_frames(*probe_side, ds_folder, chunksize):
+                    spill_join_frame(probe_frame, key_names, probe_files)
+                for partition_file in probe_files:
+                    partition_file.close()
+
+                for build_path, probe_path in zip(build_paths, probe_paths):
+                    partition_build_frames = list(read_spilled_frames(build_path))
+                    if not partition_build_frames:
+                        continue
+                    build_frame = pd.concat(partition_build_frames)
+                    for probe_frame in read_spilled_frames(probe_path):
+                        n_triples += write_join_triples(
+                            join_frames(probe_frame, build_frame, key_names, build_is_parent), len(predicate_maps), writer, graph_list)
+            finally:
+                shutil.rmtree(spill_folder, ignore_errors=True)
+            return n_triples
+
+    if not build_frames:
+        return 0
+    build_frame = pd.concat(build_frames)
+
+    for probe_frame in read_join_side_frames(*probe_side, ds_folder, chunksize):
+        n_triples += write_join_triples(
+            join_frames(probe_frame, build_frame, key_names, build_is_parent), len(predicate_maps), writer, graph_list)
+
+    return n_triples
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to materialize all the referencing object maps (with join conditions) of a TriplesMap
+#(in their graphs if the writer writes N-Quads)
+#returns the number of triples written
+def materialize_triplesmap_joins(rules, writer, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, join_memory=DEFAULT_JOIN_MEMORY):
+
+    n_triples = 0
+
+    if not rules["subject"]:
+        return n_triples
+
+    for pom in rules["predicate_object_maps"]:
+        graph_list = pom["graphs"] if writer.rdf_format == "nquads" else [None]
+        for ref_object in pom["referencing_objects"]:
+            if ref_object["join_conditions"]:
+                n_triples += materialize_join(rules, pom["predicates"], ref_object, writer, ds_folder, chunksize, join_memory,
+                    graph_list)
+
+    return n_triples
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to check whether a TriplesMap has referencing object maps with join conditions
+def has_joins(rules):
+    return any(ref_object["join_conditions"] for pom in rules["predicate_object_maps"]
+        for ref_object in pom["referencing_objects"])
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to group the TriplesMaps that read the same data (see get_source_key), so that it is only read once
+#returns a list of lists of rules, in the order of the mapping (TriplesMaps without Subject Map are left out)
+def get_source_groups(plan):
+
+    source_group_list = []
+    for tmap_label_list in plan.sources.values():
+        rules_list = [plan.triplesmaps[tmap_label] for tmap_label in tmap_label_list]
+        rules_list = [rules for rules in rules_list if rules["subject"]]
+        if rules_list:
+            source_group_list.append(rules_list)
+
+    return source_group_list
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#PIPELINE
+#the chunks of a data source go through three stages that run at the same time, each one in its own thread:
+#read (next chunk of the data source) -> transform (terms of the triples) -> write (lines to the output file)
+#so reading and writing (which release the GIL) overlap with the transformation of other chunks
+#the stages are connected by bounded queues: a stage waits when the next one is behind (memory stays flat)
+#each stage processes the chunks in order (the transform stage keeps the subjects seen in the previous chunks,
+#see get_new_subject_rows), so the output is the same as reading, transforming and writing one chunk at a time
+
+#Function to check whether an event loop is running in this thread (then the pipeline cannot be run,
+#e.g. in a notebook, and the chunks are processed one at a time)
+def has_running_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+#read stage: puts the chunks in the queue, then None
+async def read_stage(chunks, executor, out_queue):
+
+    loop = asyncio.get_running_loop()
+    while (chunk := await loop.run_in_executor(executor, next, chunks, None)) is not None:
+        await out_queue.put(chunk)
+    await out_queue.put(None)
+
+#transform stage: puts transform(chunk) in the queue (unless it is None), then None
+async def transform_stage(transform, executor, in_queue, out_queue):
+
+    loop = asyncio.get_running_loop()
+    while (chunk := await in_queue.get()) is not None:
+        chunk_terms = await loop.run_in_executor(executor, transform, chunk)
+        if chunk_terms is not None:
+            await out_queue.put(chunk_terms)
+    await out_queue.put(None)
+
+#write stage: calls write with the output of the transform stage, then progress() (in the thread of the event loop)
+async def write_stage(write, executor, in_queue, progress=None):
+
+    loop = asyncio.get_running_loop()
+    while (chunk_terms := await in_queue.get()) is not None:
+        await loop.run_in_executor(executor, functools.partial(write, *chunk_terms))
+        if progress:
+            progress()
+
+#Function to run the pipeline: chunks is an iterator of chunks, transform(chunk) returns the arguments of
+#write (or None if the chunk generates no triples)
+#progress() is called after each write (e.g. to show the progress of the run)
+#if a stage fails, the other stages are cancelled and the error is raised
+async def run_chunk_pipeline(chunks, transform, write, queue_size=PIPELINE_QUEUE_SIZE, progress=None):
+
+    transform_queue = asyncio.Queue(queue_size)
+    write_queue = asyncio.Queue(queue_size)
+    executor_list = [ThreadPoolExecutor(max_workers=1) for stage in range(3)]    #one thread per stage
+
+    task_list = [asyncio.create_task(read_stage(chunks, executor_list[0], transform_queue)),
+        asyncio.create_task(transform_stage(transform, executor_list[1], transform_queue, write_queue)),
+        asyncio.create_task(write_stage(write, executor_list[2], write_queue, progress))]
+    try:
+        await asyncio.gather(*task_list)
+    finally:
+        for task in task_list:
+            task.cancel()
+        for executor in executor_list:
+            executor.shutdown(wait=True)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#CHECKPOINTS
+#a sequential run can write periodic checkpoints, so that an interrupted run is resumed from the last one
+#instead of starting over. A checkpoint has:
+#- the position of the run: source group, rows of its data source already materialized, whether the data source
+#has been read to the end and the TriplesMaps of the group whose joins are done
+#- the stats and the hashes of the subjects seen so far (see get_new_subject_rows)
+#- the state of the writer: position of the output files, data of the current compressed block and the files of
+#the deduplication folder (the set is saved in deltas and the runs are spilled, see rdf_writers.DedupNTriplesWriter)
+#the output written after the checkpoint is discarded and written again, so the output of the resumed run is
+#byte-identical to the output of an uninterrupted run
+#a checkpoint is only resumed by a run with the same mapping, output, options and data sources (size and
+#modification time of the files), otherwise it is an error
+
+#Function to get the default path of the checkpoint of a run
+def get_checkpoint_path(output_path):
+    return output_path + ".checkpoint"
+
+#Function to get what identifies a run: a checkpoint can only be resumed by the same run
+def get_checkpoint_run_key(plan, output_path, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE,
+    join_memory=DEFAULT_JOIN_MEMORY, dedup_memory=None, shards=None):
+
+    source_dict = {}
+    for rules in plan.triplesmaps.values():
+        if rules["source"] and os.path.isfile(get_source_path(rules, ds_folder)):
+            file_stat = os.stat(get_source_path(rules, ds_folder))
+            source_dict[rules["source"]] = (file_stat.st_size, file_stat.st_mtime_ns)
+
+    return {"mapping": plan.mapping_hash, "output": os.path.abspath(output_path), "chunksize": chunksize,
+        "join_memory": join_memory, "dedup_memory": dedup_memory, "shards": shards, "sources": source_dict}
+
+#checkpoint = MaterializationCheckpoint("output.nt.checkpoint", run_key)
+#checkpoint.state is the last checkpoint (None if there is none, the run starts from the beginning)
+#checkpoint.save(...) writes a new checkpoint if interval seconds have passed since the last one
+class MaterializationCheckpoint:
+
+    def __init__(self, checkpoint_path, run_key, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.checkpoint_path = checkpoint_path
+        self.run_key = run_key
+        self.interval = interval
+        self.state = None
+        self.group_index = 0    #source group being materialized
+        self.stats_dict = {}    #stats of the run (source groups already materialized)
+        self.last_save = time.monotonic()
+
+        if os.path.isfile(checkpoint_path):
+            with open(checkpoint_path, "rb") as f:
+                state = pickle.load(f)
+            if state["run"] != run_key:
+                raise ValueError(f"The checkpoint {checkpoint_path} belongs to a run with another mapping, output, "
+                    "options or data sources (delete it to start over)")
+            self.state = state
+            self.stats_dict = state["stats"]
+
+    #state of the writer in the checkpoint (None: new output)
+    def get_writer_checkpoint(self):
+        return self.state["writer"] if self.state else None
+
+    #checkpoint of the source group being materialized (None: the group starts from the beginning)
+    def get_group_state(self):
+        if self.state and self.state["group"] == self.group_index:
+            return self.state
+        return None
+
+    def is_group_done(self, group_index):
+        return self.state is not None and group_index < self.state["group"]
+
+    #the checkpoint is written to a temporary file and then renamed, so it is never left half written
+    def save(self, writer, group_stats_dict, seen_subjects_dict, rows, scanned=False, joins=0):
+
+        if time.monotonic() - self.last_save < self.interval:
+            return
+
+        state = {"run": self.run_key, "group": self.group_index, "rows": rows, "scanned": scanned, "joins": joins,
+            "stats": self.stats_dict, "group_stats": group_stats_dict, "seen_subjects": seen_subjects_dict,
+            "writer": writer.get_checkpoint()}
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.checkpoint_path)
+        self.last_save = time.monotonic()
+
+    def remove(self):
+        if os.path.isfile(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#RUN STATS
+#each run records, for each TriplesMap: rows read, triples generated, bytes written (N-Triples / N-Quads lines,
+#before compression and deduplication) and seconds spent reading its data source, generating its terms
+#(templates), in its joins (reading both sides and writing the triples) and writing its triples
+#the TriplesMaps with the same data source share its scan and the batches written: the read time is split
+#equally among them, and the write time and bytes in proportion to their triples in each batch
+
+#Function to get the stats of a TriplesMap before the run
+def get_empty_stats():
+    return {"rows": 0, "triples": 0, "bytes": 0, "read_seconds": 0.0, "template_seconds": 0.0, "join_seconds": 0.0,
+        "write_seconds": 0.0}
+
+#Function to add a value shared by several TriplesMaps to their stats, in proportion to their triples
+#triples_dict = {TriplesMap label: triples} (equal parts if there are no triples)
+#integer values (bytes) are split so that the parts add up to the value
+def add_shared_stats(stats_dict, triples_dict, key, value):
+
+    total_triples = sum(triples_dict.values())
+    cumulative_share, assigned = 0, 0
+    for tmap_label, n_triples in triples_dict.items():
+        share = n_triples / total_triples if total_triples else 1 / len(triples_dict)
+        if isinstance(value, int):
+            cumulative_share += share
+            part = round(value * cumulative_share) - assigned
+            assigned += part
+        else:
+            part = value * share
+        stats_dict[tmap_label][key] += part
+
+#Function to time the reading of the chunks of a data source, shared by the TriplesMaps in tmap_label_list
+def time_chunks(chunks, stats_dict, tmap_label_list):
+
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            add_shared_stats(stats_dict, dict.fromkeys(tmap_label_list, 0), "read_seconds", time.perf_counter() - start)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        chunks.close()
+
+#Function to get the report of a run as a dictionary that can be saved as JSON (see write_run_report)
+#stats_dict = stats of the run (see get_empty_stats), seconds = duration of the run
+#options = arguments of the run (output file, workers...)
+def get_run_report(stats_dict, seconds, options=None):
+
+    total_stats = get_empty_stats()
+    for stats in stats_dict.values():
+        for key, value in stats.items():
+            total_stats[key] += value
+
+    triplesmap_dict = {}
+    for tmap_label, stats in stats_dict.items():
+        tmap_seconds = stats["read_seconds"] + stats["template_seconds"] + stats["join_seconds"] + stats["write_seconds"]
+        triplesmap_dict[tmap_label] = dict(stats, seconds=tmap_seconds,
+            rows_per_second=stats["rows"] / tmap_seconds if tmap_seconds else None,
+            triples_per_second=stats["triples"] / tmap_seconds if tmap_seconds else None)
+
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "seconds": seconds, "options": options or {},
+        "total": dict(total_stats, triples_per_second=total_stats["triples"] / seconds if seconds else None),
+        "triplesmaps": triplesmap_dict}
+
+#Function to save the report of a run (see get_run_report)
+def write_run_report(report_path, report):
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+#Function to get the default path of the report of a run (output.nt -> output.report.json)
+def get_report_path(output_path):
+    return split_output_path(output_path)[0] + ".report.json"
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to generate the terms of a chunk for a group of TriplesMaps with the same data source
+#(row by row: all the triples of the first TriplesMap for the row, then those of the second one...)
+#stats_dict is updated with the rows, triples and template time of each TriplesMap
+#returns the arguments of write_source_group_chunk (terms and {TriplesMap label: triples}), or None if there are no triples
+def transform_source_group_chunk(rules_list, chunk, seen_subjects_dict, quads, stats_dict):
+
+    term_triples = []
+    triples_dict = {}
+    for rules in rules_list:
+        start = time.perf_counter()
+        tmap_term_triples = get_chunk_term_triples(rules, chunk, seen_subjects_dict, quads)
+        triples_dict[rules["label"]] = count_term_triples(tmap_term_triples)
+        stats_dict[rules["label"]]["rows"] += len(chunk)
+        stats_dict[rules["label"]]["triples"] += triples_dict[rules["label"]]
+        stats_dict[rules["label"]]["template_seconds"] += time.perf_counter() - start
+        term_triples += tmap_term_triples
+
+    if not term_triples:
+        return None
+
+    start = time.perf_counter()
+    chunk_terms = get_row_major_terms(term_triples)
+    add_shared_stats(stats_dict, triples_dict, "template_seconds", time.perf_counter() - start)
+
+    return chunk_terms, triples_dict
+
+#Function to write the terms of a chunk (see transform_source_group_chunk)
+#stats_dict is updated with the bytes and write time of each TriplesMap
+def write_source_group_chunk(writer, stats_dict, chunk_terms, triples_dict):
+
+    start = time.perf_counter()
+    bytes_written = writer.bytes_written
+    writer.write_batch(*chunk_terms)
+    add_shared_stats(stats_dict, triples_dict, "write_seconds", time.perf_counter() - start)
+    add_shared_stats(stats_dict, triples_dict, "bytes", writer.bytes_written - bytes_written)
+
+#Function to materialize the joins of a TriplesMap (see materialize_triplesmap_joins)
+#tmap_stats is updated with the triples, bytes and time of the joins
+def materialize_triplesmap_joins_stats(rules, writer, tmap_stats, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE,
+    join_memory=DEFAULT_JOIN_MEMORY):
+
+    start = time.perf_counter()
+    bytes_written = writer.bytes_written
+    tmap_stats["triples"] += materialize_triplesmap_joins(rules, writer, ds_folder, chunksize, join_memory)
+    tmap_stats["join_seconds"] += time.perf_counter() - start
+    tmap_stats["bytes"] += writer.bytes_written - bytes_written
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to materialize a group of TriplesMaps with the same data source, writing the triples with a writer (see rdf_writers)
+#the data source is read once (only the columns referenced by some of the TriplesMaps) and each chunk is
+#materialized by all of them: the triples are written row by row (all the triples of the first TriplesMap
+#for the row, then those of the second one...)
+#the triples of the joins (if joins=True) are written after the triples of the rows
+#if the writer writes N-Quads, the triples are written in their graphs (see get_chunk_term_triples)
+#with pipeline=True, reading, transforming and writing the chunks overlap (see run_chunk_pipeline)
+#with a checkpoint (see MaterializationCheckpoint), the group is resumed from its checkpoint (if any), and new
+#checkpoints are written between chunks and joins (the chunks are then processed one at a time)
+#progress(stats_dict) is called after each chunk and each join, with the stats of the group so far
+#returns {TriplesMap label: stats} (rows read, triples written, bytes and times, see get_empty_stats)
+def materialize_source_group(rules_list, writer, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, byte_range=None,
+    joins=True, join_memory=DEFAULT_JOIN_MEMORY, pipeline=True, checkpoint=None, progress=None):
+
+    stats_dict = {rules["label"]: get_empty_stats() for rules in rules_list}
+    rules_list = [rules for rules in rules_list if rules["subject"]]    #TriplesMap without Subject Map generates no triples
+    if not rules_list:
+        return stats_dict
+
+    usecols = []
+    for rules in rules_list:
+        usecols += [column for column in rules["columns"] if column not in usecols]
+    seen_subjects_dict = {rules["label"]: get_empty_seen_subjects() for rules in rules_list}    #for the subject triples
+    quads = writer.rdf_format == "nquads"
+
+    group_state = checkpoint.get_group_state() if checkpoint else None
+    rows, scanned, joins_done = 0, False, 0
+    if group_state:
+        stats_dict, seen_subjects_dict = group_state["group_stats"], group_state["seen_subjects"]
+        rows, scanned, joins_done = group_state["rows"], group_state["scanned"], group_state["joins"]
+
+    if not scanned:
+        subject_columns = [get_term_map_references(rules["subject"]) for rules in rules_list]
+        chunks = time_chunks(read_source_chunks(rules_list[0], ds_folder, chunksize, byte_range, usecols, subject_columns,
+            rows), stats_dict, [rules["label"] for rules in rules_list])
+        transform = functools.partial(transform_source_group_chunk, rules_list,
+            seen_subjects_dict=seen_subjects_dict, quads=quads, stats_dict=stats_dict)
+        write = functools.partial(write_source_group_chunk, writer, stats_dict)
+        progress_group = functools.partial(progress, stats_dict) if progress else None
+
+        try:
+            if pipeline and not checkpoint and not has_running_event_loop():
+                asyncio.run(run_chunk_pipeline(chunks, transform, write, progress=progress_group))
+            else:
+                for chunk in chunks:
+                    chunk_output = transform(chunk)
+                    if chunk_output is not None:
+                        write(*chunk_output)
+                    rows += len(chunk)
+                    if checkpoint:
+                        checkpoint.save(writer, stats_dict, seen_subjects_dict, rows)
+                    if progress:
+                        progress(stats_dict)
+        finally:
+            chunks.close()
+
+    if joins:
+        for i, rules in enumerate(rules_list):
+            if i < joins_done or not has_joins(rules):
+                continue
+            materialize_triplesmap_joins_stats(rules, writer, stats_dict[rules["label"]], ds_folder, chunksize, join_memory)
+            if checkpoint:
+                checkpoint.save(writer, stats_dict, seen_subjects_dict, rows, True, i + 1)
+            if progress:
+                progress(stats_dict)
+
+    return stats_dict
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to materialize a group of TriplesMaps into its own file (shard)
+#it runs in a worker process of the pool, so it only receives picklable arguments
+def materialize_source_group_to_file(rules_list, shard_path, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, byte_range=None,
+    joins=True, join_memory=DEFAULT_JOIN_MEMORY, rdf_format=None):
+
+    with NTriplesWriter(shard_path, rdf_format) as writer:
+        return materialize_source_group(rules_list, writer, ds_folder, chunksize, byte_range, joins, join_memory)
+
+#same, only for the joins of a TriplesMap
+def materialize_triplesmap_joins_to_file(rules, shard_path, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE,
+    join_memory=DEFAULT_JOIN_MEMORY, rdf_format=None):
+
+    with NTriplesWriter(shard_path, rdf_format) as writer:
+        tmap_stats = get_empty_stats()
+        materialize_triplesmap_joins_stats(rules, writer, tmap_stats, ds_folder, chunksize, join_memory)
+        return {rules["label"]: tmap_stats}
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to open the writer of the output
+#with dedup_memory (bytes), each triple is only written once (see rdf_writers.DedupNTriplesWriter)
+#with shards, the output is split into that many files by subject (see rdf_writers.ShardedNTriplesWriter)
+#with graph_files=True, the triples of each graph are written to their own file (see rdf_writers.GraphNTriplesWriter)
+#checkpoint = state of the writer to resume (see MaterializationCheckpoint), not supported with graph_files
+def open_triples_writer(output_path, dedup_memory=None, shards=None, graph_files=False, checkpoint=None):
+
+    if shards and graph_files:
+        raise ValueError("The output cannot be split both by subject (shards) and by graph")
+    if graph_files:
+        return GraphNTriplesWriter(output_path, dedup_memory=dedup_memory)
+    if shards:
+        return ShardedNTriplesWriter(output_path, shards, dedup_memory=dedup_memory, checkpoint=checkpoint)
+    if dedup_memory:
+        return DedupNTriplesWriter(output_path, dedup_memory=dedup_memory, checkpoint=checkpoint)
+    return NTriplesWriter(output_path, checkpoint=checkpoint)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to merge the shards of the workers (in the given order) into the output file and delete them
+#with dedup_memory, shards or graph_files, the lines go through the writer of the output (see open_triples_writer)
+def merge_shards(shard_path_list, output_path, dedup_memory=None, shards=None, graph_files=False):
+
+    if dedup_memory or shards or graph_files:
+        with open_triples_writer(output_path, dedup_memory, shards, graph_files) as writer:
+            for shard_path in shard_path_list:
+                with open(shard_path, "r", encoding="utf-8", newline="\n") as shard:
+                    while lines := shard.readlines(SHARD_COPY_BUFFER):
+                        writer.write_lines(lines)
+                os.remove(shard_path)
+        return
+
+    with open_output_file(output_path) as f:
+        for shard_path in shard_path_list:
+            with open(shard_path, "rb") as shard:
+                shutil.copyfileobj(shard, f, SHARD_COPY_BUFFER)
+            os.remove(shard_path)
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the byte ranges in which the csv data source of a group of TriplesMaps is processed in parallel
+#small files (and other formats) are not split: [None]
+#groups with subject triples are not split either, because the subjects seen in one range are not known by the
+#others, so the subject triples of a subject in several ranges would be written once per range (see get_new_subject_rows)
+def get_source_group_byte_ranges(rules_list, ds_folder=None, workers=None):
+
+    rules = rules_list[0]
+    if not rules["subject"] or not rules["source"] or not is_csv_source(rules):
+        return [None]
+    if any(tmap_rules["subject"] and tmap_rules["subject_triples"] for tmap_rules in rules_list):
+        return [None]
+
+    file_path = get_source_path(rules, ds_folder)
+    if not os.path.isfile(file_path):
+        return [None]
+    n_ranges = min(workers or os.cpu_count() or 1, os.path.getsize(file_path) // CSV_SPLIT_MIN_BYTES)
+    if n_ranges < 2:
+        return [None]
+
+    header_end, ranges = get_csv_byte_ranges(file_path, n_ranges)
+    if len(ranges) < 2:
+        return [None]
+
+    return [(header_end, start, end) for start, end in ranges]
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to materialize the mapping with a process pool (one task per group of TriplesMaps with the same data source)
+#big csv data sources are split into byte ranges, and each range is a separate task (see get_source_group_byte_ranges)
+#the joins of each TriplesMap are one more task (after the ranges of its data source)
+#each task is written to a shard in a temporary folder next to the output, then the shards are merged
+#in the order of the mapping (so the output is the same as a single-process run)
+#progress(stats_dict) is called each time a task is done (the bytes are those of the shards, before the merge)
+def materialize_parallel(plan, output_path, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, workers=None,
+    join_memory=DEFAULT_JOIN_MEMORY, dedup_memory=None, shards=None, graph_files=False, progress=None):
+
+    stats_dict = {tmap_label: get_empty_stats() for tmap_label in plan.triplesmaps}
+    rdf_format = "nquads" if graph_files else get_rdf_format(output_path)
+    if shards and graph_files:
+        raise ValueError("The output cannot be split both by subject (shards) and by graph")
+    shard_folder = tempfile.mkdtemp(prefix=".rdfolio_shards_", dir=os.path.dirname(os.path.abspath(output_path)))
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            task_list = []     #[(shard path, future)]
+            for rules_list in get_source_groups(plan):
+                for byte_range in get_source_group_byte_ranges(rules_list, ds_folder, workers):
+                    shard_path = os.path.join(shard_folder, f"{len(task_list):06d}.nt")
+                    task_list.append((shard_path, pool.submit(materialize_source_group_to_file,
+                        rules_list, shard_path, ds_folder, chunksize, byte_range, False, join_memory, rdf_format)))
+                for rules in rules_list:
+                    if has_joins(rules):
+                        shard_path = os.path.join(shard_folder, f"{len(task_list):06d}.nt")
+                        task_list.append((shard_path, pool.submit(materialize_triplesmap_joins_to_file,
+                            rules, shard_path, ds_folder, chunksize, join_memory, rdf_format)))
+
+            for shard_path, future in task_list:
+                for tmap_label, stats in future.result().items():
+                    for key, value in stats.items():
+                        stats_dict[tmap_label][key] += value
+                if progress:
+                    progress(stats_dict)
+
+        merge_shards([shard_path for shard_path, future in task_list], output_path, dedup_memory, shards, graph_files)
+
+    finally:
+        shutil.rmtree(shard_folder, ignore_errors=True)
+
+    return stats_dict
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to materialize the mapping into an N-Triples file (or N-Quads, if the output file is .nq)
+#the output is compressed if its extension is .gz or .zst (e.g. output.nt.gz)
+#the data sources are streamed in chunks, so memory does not grow with the size of the input
+#TriplesMaps with the same data source share the same scan of the data source (see materialize_source_group)
+#with workers > 1 (or None, one per core), the groups are materialized in parallel by a process pool
+#join_memory (bytes) is the memory budget of the build side of each join (see materialize_join)
+#with dedup_memory (bytes), each triple is only written once (see rdf_writers.DedupNTriplesWriter)
+#with shards, the output is split into that many files by a hash of the subject, plus a manifest
+#(output-00000-of-00008.nt... and output.manifest.json, see rdf_writers.ShardedNTriplesWriter)
+#N-Quads output (.nq) has the graphs of the triples (rr:graph / rr:graphMap), with graph_files=True the triples
+#of each graph are written to their own N-Triples file instead (see rdf_writers.GraphNTriplesWriter)
+#with checkpoint_path (e.g. get_checkpoint_path(output_path)), a checkpoint is written every checkpoint_interval
+#seconds, and if the file already exists the run is resumed from it (see MaterializationCheckpoint)
+#the checkpoint is deleted when the run is done (only sequential runs, workers=1, without graph_files)
+#progress(stats_dict) is called during the run with the stats of all the TriplesMaps so far (e.g. for a progress
+#panel), and with report_path the report of the run is saved as JSON (see get_run_report)
+#g is the mapping graph or its execution plan (see get_mapping_plan)
+#returns {TriplesMap label: stats} (rows, triples generated before deduplication, bytes and times, see get_empty_stats)
+def materialize(g, output_path, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, workers=1, join_memory=DEFAULT_JOIN_MEMORY,
+    dedup_memory=None, shards=None, graph_files=False, checkpoint_path=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+    progress=None, report_path=None):
+
+    start = time.perf_counter()
+    plan = get_mapping_plan(g)
+
+    if checkpoint_path and (workers != 1 or graph_files):
+        raise ValueError("Checkpoints are only supported by sequential runs (workers=1) without graph files")
+    if workers != 1:
+        stats_dict = materialize_parallel(plan, output_path, ds_folder, chunksize, workers, join_memory, dedup_memory,
+            shards, graph_files, progress)
+    else:
+        stats_dict = materialize_sequential(plan, output_path, ds_folder, chunksize, join_memory, dedup_memory, shards,
+            graph_files, checkpoint_path, checkpoint_interval, progress)
+
+    if report_path:
+        write_run_report(report_path, get_run_report(stats_dict, time.perf_counter() - start,
+            {"output": output_path, "workers": workers, "chunksize": chunksize, "join_memory": join_memory,
+            "dedup_memory": dedup_memory, "shards": shards, "graph_files": graph_files,
+            "checkpoint": checkpoint_path is not None}))
+
+    return stats_dict
+
+#Function to materialize the groups of TriplesMaps one after the other in this process (see materialize)
+def materialize_sequential(plan, output_path, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, join_memory=DEFAULT_JOIN_MEMORY,
+    dedup_memory=None, shards=None, graph_files=False, checkpoint_path=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+    progress=None):
+
+    stats_dict = {tmap_label: get_empty_stats() for tmap_label in plan.triplesmaps}
+    progress_group = (lambda group_stats_dict: progress({**stats_dict, **group_stats_dict})) if progress else None
+
+    if not checkpoint_path:
+        with open_triples_writer(output_path, dedup_memory, shards, graph_files) as writer:
+            for rules_list in get_source_groups(plan):
+                stats_dict.update(materialize_source_group(rules_list, writer, ds_folder, chunksize, join_memory=join_memory,
+                    progress=progress_group))
+        return stats_dict
+
+    checkpoint = MaterializationCheckpoint(checkpoint_path, get_checkpoint_run_key(plan, output_path, ds_folder, chunksize,
+        join_memory, dedup_memory, shards), checkpoint_interval)
+    stats_dict.update(checkpoint.stats_dict)
+    checkpoint.stats_dict = stats_dict
+
+    writer = open_triples_writer(output_path, dedup_memory, shards, checkpoint=checkpoint.get_writer_checkpoint())
+    try:
+        for group_index, rules_list in enumerate(get_source_groups(plan)):
+            if checkpoint.is_group_done(group_index):
+                continue
+            checkpoint.group_index = group_index
+            stats_dict.update(materialize_source_group(rules_list, writer, ds_folder, chunksize, join_memory=join_memory,
+                checkpoint=checkpoint, progress=progress_group))
+    except BaseException:
+        writer.abort()    #the output is resumed from the last checkpoint
+        raise
+    writer.close()
+    checkpoint.remove()
+
+    return stats_dict
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#INCREMENTAL MATERIALIZATION
+#each run keeps a state for each TriplesMap (in a state folder): a fingerprint index with the hashes of the distinct
+#rows of its data source (only the referenced columns) and the hash of the subject generated by each row
+#the next run compares the hashes to find the added and removed rows, and only materializes the subjects
+#they generate, with the old rules and rows and with the new ones:
+#deletions = triples of those subjects that are no longer generated
+#additions = triples of those subjects that were not generated before
+#(the first run of a TriplesMap writes all its triples to the additions file)
+#the rows themselves are kept in a rows file next to the index, and are only read for the subjects that changed
+#the deletions file must be applied before the additions file
+#TriplesMaps with joins are not supported (their triples do not only depend on their own rows)
+
+INCREMENTAL_STATE_EXTENSION = ".pkl"
+INCREMENTAL_ROWS_EXTENSION = ".rows"
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the key of the state of a TriplesMap (label, data source and subject map)
+def get_incremental_state_key(rules):
+
+    key = "\x00".join(str(value) for value in (rules["label"], *get_source_key(rules),
+        rules["subject"]["type"], rules["subject"]["value"]))
+
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+#Function to get the paths of the index and the rows file of a state (temp: files of the current run)
+def get_incremental_state_paths(state_folder, key, temp=False):
+
+    suffix = ".tmp" if temp else ""
+    return (os.path.join(state_folder, key + INCREMENTAL_STATE_EXTENSION + suffix),
+        os.path.join(state_folder, key + INCREMENTAL_ROWS_EXTENSION + suffix))
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Functions to save and load the state (fingerprint index) of a TriplesMap
+#{"label": TriplesMap label, "rules": rules, "hashes": sorted hashes of the distinct rows (uint64 array),
+#"subjects": hash of the subject of each row (uint64 array, same order as hashes)}
+def save_incremental_state(state_path, state):
+    with open(state_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_incremental_state(state_path):
+    with open(state_path, "rb") as f:
+        return pickle.load(f)
+
+#Function to iterate over the chunks of a rows file: (rows indexed by row hash, subject hashes of the rows)
+#(a row can be repeated in several chunks)
+def iter_incremental_rows(rows_path):
+
+    with open(rows_path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to read the data source of a TriplesMap chunk by chunk (only the referenced columns)
+#the rows that generate a subject are appended to the rows file, and only their hashes are kept in memory
+#returns the sorted hashes of the distinct rows and the hashes of their subjects (see save_incremental_state)
+#if a writer is given, the triples of the rows are also written (first run of the TriplesMap)
+def read_incremental_rows(rules, rows_path, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE, writer=None):
+
+    columns = list(rules["columns"])
+    hash_list = []
+    subject_hash_list = []
+
+    with open(rows_path, "wb") as f:
+        for chunk in read_source_chunks(rules, ds_folder, chunksize, usecols=columns):
+            missing_columns = [column for column in columns if column not in chunk.columns]
+            if missing_columns and is_tabular_source(rules):
+                raise ValueError(f"Column {missing_columns[0]} (TriplesMap {rules['label']}) not found in {rules['source']}")
+
+            rows = chunk.reindex(columns=columns).astype(object)
+            if columns:
+                rows.index = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+            else:    #all the terms are constant: every row is the same
+                rows.index = np.zeros(len(rows), dtype=np.uint64)
+            rows = rows[~rows.index.duplicated()]
+
+            if writer is not None:
+                chunk_terms = materialize_chunk(rules, rows)
+                if chunk_terms:
+                    writer.write_batch(*chunk_terms)
+
+            subjects = generate_terms(rules["subject"], rows, rules)
+            has_subject = subjects.notna().to_numpy()    #rows without subject do not generate triples
+            rows = rows[has_subject]
+            subject_hashes = pd.util.hash_pandas_object(subjects[has_subject], index=False).to_numpy()
+            if len(rows):
+                pickle.dump((rows, subject_hashes), f, protocol=pickle.HIGHEST_PROTOCOL)
+                hash_list.append(rows.index.to_numpy(dtype=np.uint64))
+                subject_hash_list.append(subject_hashes)
+
+    if not hash_list:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+
+    hashes, first_rows = np.unique(np.concatenate(hash_list), return_index=True)
+
+    return hashes, np.concatenate(subject_hash_list)[first_rows]
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to get the triples (N-Triples lines, without the line break) generated by some rows of a TriplesMap
+def get_incremental_lines(rules, rows):
+
+    if not len(rows):
+        return set()
+
+    chunk_terms = materialize_chunk(rules, rows)
+    if not chunk_terms:
+        return set()
+
+    text, n_lines = get_lines(*chunk_terms)
+    return set(text.split("\n")[:-1])
+
+#Function to get the triples generated by the rows of a rows file whose subject is affected (hashes)
+#the rows file is read chunk by chunk
+def get_incremental_affected_lines(rules, rows_path, affected_subjects):
+
+    line_set = set()
+    for rows, subject_hashes in iter_incremental_rows(rows_path):
+        affected_rows = np.isin(subject_hashes, affected_subjects)
+        if affected_rows.any():
+            line_set |= get_incremental_lines(rules, rows[affected_rows])
+
+    return line_set
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to write a set of N-Triples lines (sorted, so that the files do not change between identical runs)
+def write_incremental_lines(line_set, writer):
+    writer.write_text("".join(line + "\n" for line in sorted(line_set)), len(line_set))
+
+#___________________________________________________________________________________
+
+
+#___________________________________________________________________________________
+#Function to materialize only the changes in the data sources since the last run with the same state folder
+#writes the triples to remove (deletions_path) and to add (additions_path), both N-Triples
+#returns {"additions": triples, "deletions": triples,
+#"triplesmaps": {TriplesMap label: {"rows", "added_rows", "removed_rows"}}}
+def materialize_incremental(g, additions_path, deletions_path, state_folder, ds_folder=None, chunksize=DEFAULT_CHUNKSIZE):
+
+    rules_dict = get_mapping_plan(g).triplesmaps
+    for tmap_label, rules in rules_dict.items():
+        if rules["subject"] and has_joins(rules):
+            raise ValueError(f"TriplesMap {tmap_label} has joins, it cannot be materialized incrementally")
+
+    os.makedirs(state_folder, exist_ok=True)
+    old_state_dict = {}     #{state key: state of the last run} (each state is loaded once)
+    for file in os.listdir(state_folder):
+        if file.endswith(INCREMENTAL_STATE_EXTENSION):
+            old_state_dict[file[:-len(INCREMENTAL_STATE_EXTENSION)]] = load_incremental_state(os.path.join(state_folder, file))
+    new_state_dict = {}     #{state key: state of this run} (saved as .tmp until the end of the run)
+    affected_list = []      #hashes of the subjects whose triples may have changed
+    stats = {"additions": 0, "deletions": 0, "triplesmaps": {}}
+
+    try:
+        with NTriplesWriter(additions_path, "ntriples") as additions_writer:
+            for tmap_label, rules in rules_dict.items():
+                if not rules["subject"]:
+                    continue
+
+                key = get_incremental_state_key(rules)
+                old_state = old_state_dict.get(key)
+                state_path, rows_path = get_incremental_state_paths(state_folder, key, temp=True)
+                new_state_dict[key] = None     #(so that its temporary files are removed if the run fails)
+                hashes, subject_hashes = read_incremental_rows(rules, rows_path, ds_folder, chunksize,
+                    None if old_state else additions_writer)
+
+                new_state_dict[key] = {"label": tmap_label, "rules": rules, "hashes": hashes, "subjects": subject_hashes}
+                save_incremental_state(state_path, new_state_dict[key])
+
+                tmap_stats = {"rows": len(hashes), "added_rows": len(hashes), "removed_rows": 0}
+                if old_state is not None:
+                    if old_state["rules"] == rules:
+                        added_rows = ~np.isin(hashes, old_state["hashes"], assume_unique=True)
+                        removed_rows = ~np.isin(old_state["hashes"], hashes, assume_unique=True)
+                        affected_list += [subject_hashes[added_rows], old_state["subjects"][removed_rows]]
+                        tmap_stats["added_rows"], tmap_stats["removed_rows"] = int(added_rows.sum()), int(removed_rows.sum())
+                    else:    #the rules have changed: all its subjects may have changed
+                        affected_list += [subject_hashes, old_state["subjects"]]
+                        tmap_stats["removed_rows"] = len(old_state["hashes"])
+                stats["triplesmaps"][tmap_label] = tmap_stats
+
+            for key, state in old_state_dict.items():    #TriplesMaps removed from the mapping (or changed data source or subject)
+                if key not in new_state_dict:
+                    affected_list.append(state["subjects"])
+
+            affected_subjects = np.unique(np.concatenate(affected_list)) if affected_list else np.zeros(0, dtype=np.uint64)
+            old_lines = set()
+            new_lines = set()
+            if len(affected_subjects):    #only the rows files of the TriplesMaps with affected subjects are read
+                for key, state in old_state_dict.items():
+                    if np.isin(state["subjects"], affected_subjects).any():
+                        old_lines |= get_incremental_affected_lines(state["rules"],
+                            get_incremental_state_paths(state_folder, key)[1], affected_subjects)
+                for key, state in new_state_dict.items():
+                    #the triples of the new TriplesMaps are already in the additions file
+                    if key in old_state_dict and np.isin(state["subjects"], affected_subjects).any():
+                        new_lines |= get_incremental_affected_lines(state["rules"],
+                            get_incremental_state_paths(state_folder, key, temp=True)[1], affected_subjects)
+
+            write_incremental_lines(new_lines - old_lines, additions_writer)
+            stats["additions"] = additions_writer.triples_written
+
+        with NTriplesWriter(deletions_path, "ntriples") as deletions_writer:
+            write_incremental_lines(old_lines - new_lines, deletions_writer)
+            stats["deletions"] = deletions_writer.triples_written
+
+        for key in new_state_dict:
+            for temp_path, path in zip(get_incremental_state_paths(state_folder, key, temp=True),
+                get_incremental_state_paths(state_folder, key)):
+                os.replace(temp_path, path)
+        for key in old_state_dict:
+            if key not in new_state_dict:
+                for path in get_incremental_state_paths(state_folder, key):
+                    if os.path.isfile(path):
+                        os.remove(path)
+
+    finally:
+        for key in new_state_dict:
+            for temp_path in get_incremental_state_paths(state_folder, key, temp=True):
+                if os.path.isfile(temp_path):
+                    os.remove(temp_path)
+
+    return stats
+
+#___________________________________________________________________________________
@@ -0,0 +1,806 @@
+import os #for file navigation
+import gzip
+import json
+import hashlib
+import heapq
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+try:
+    import zstandard    #optional, only needed for .zst output
+except ImportError:
+    zstandard = None
+
+#Writers for materialized triples
+#they receive batches of already-encoded terms (<iri>, "literal", _:bnode) and write N-Triples / N-Quads
+#lines straight into a buffered file, without building an rdflib Graph
+#this module does not import streamlit (nor utils), so it can also be used outside the app
+
+
+#_________________________________________________________
+DEFAULT_WRITE_BUFFER = 8 * 1024 * 1024    #buffer of the output file
+DEFAULT_DEDUP_MEMORY = 256 * 1024 * 1024    #memory budget of the set of lines already written (deduplication)
+DEDUP_LINE_OVERHEAD = 120    #approximate memory of a line in a set, besides its characters
+DEDUP_RUN_FRACTION = 4    #the sorted runs spilled to disk use 1/4 of the deduplication budget
+
+#{format: extension}
+RDF_FORMAT_EXTENSIONS = {"ntriples": ".nt", "nquads": ".nq"}
+
+#{compression: extension} (output.nt.gz, output.nt.zst)
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSION_LEVELS = {"gzip": 6, "zstd": 3}
+COMPRESSION_BLOCK = 4 * 1024 * 1024    #blocks compressed independently (in parallel)
+DEFAULT_COMPRESSION_THREADS = min(8, os.cpu_count() or 1)
+CHECKSUM_BUFFER = 16 * 1024 * 1024    #buffer to compute the checksums of the shards
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to get the compression from the extension of the output file (None if it is not compressed)
+def get_compression(output_path):
+
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if output_path.lower().endswith(extension):
+            return compression
+
+    return None
+
+#Function to get the list of available compressions (zstd needs the zstandard package)
+def get_compression_list():
+    return [compression for compression in COMPRESSION_EXTENSIONS if compression != "zstd" or zstandard is not None]
+
+#Function to get the output format from the extension of the output file (N-Triples by default)
+#the compression extension is ignored (output.nq.gz -> nquads)
+def get_rdf_format(output_path):
+
+    filename = os.path.basename(output_path).lower()
+    compression = get_compression(filename)
+    if compression:
+        filename = filename[:-len(COMPRESSION_EXTENSIONS[compression])]
+
+    for rdf_format, extension in RDF_FORMAT_EXTENSIONS.items():
+        if filename.endswith(extension):
+            return rdf_format
+
+    return "ntriples"
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to build the N-Triples / N-Quads lines of a batch of encoded terms
+#subjects, predicates and objects are aligned arrays (or Series) of encoded terms
+#graphs is either None (default graph), one encoded graph term for the whole batch, or an aligned array
+#returns an array with the lines (each ending with a line break), rows with a null term are skipped
+def get_line_array(subjects, predicates, objects, graphs=None):
+
+    subjects = np.asarray(subjects, dtype=object)
+    predicates = np.asarray(predicates, dtype=object)
+    objects = np.asarray(objects, dtype=object)
+
+    valid = pd.notna(subjects) & pd.notna(predicates) & pd.notna(objects)
+    if not valid.all():
+        subjects, predicates, objects = subjects[valid], predicates[valid], objects[valid]
+        if graphs is not None and not isinstance(graphs, str):
+            graphs = np.asarray(graphs, dtype=object)[valid]
+
+    if not len(subjects):
+        return np.array([], dtype=object)
+
+    lines = subjects + " " + predicates + " " + objects
+    if graphs is None:
+        lines = lines + " .\n"
+    elif isinstance(graphs, str):
+        lines = lines + f" {graphs} .\n"
+    else:    #rows without graph go to the default graph
+        graphs = np.asarray(graphs, dtype=object)
+        graph_suffix = np.where(pd.notna(graphs), " " + graphs.astype(str) + " .\n", " .\n")
+        lines = lines + graph_suffix
+
+    return lines
+
+#same, joined: returns the lines (str) and the number of lines
+def get_lines(subjects, predicates, objects, graphs=None):
+    lines = get_line_array(subjects, predicates, objects, graphs)
+    return "".join(lines), len(lines)
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to compress a block (each block is a complete gzip member / zstd frame, and
+#concatenated members / frames are a valid gzip / zstd file)
+def compress_block(block, compression, level):
+
+    if compression == "gzip":
+        return gzip.compress(block, compresslevel=level, mtime=0)
+
+    return zstandard.ZstdCompressor(level=level).compress(block)
+
+#Binary file that compresses what is written to it, in blocks compressed in parallel by a pool of threads
+#(zlib and zstandard release the GIL), and written to the file in order
+#checkpoint (see checkpoint()) reopens the file at a checkpoint, discarding what was written after it
+class ParallelCompressedFile:
+
+    def __init__(self, output_path, compression, threads=None, level=None, block_size=COMPRESSION_BLOCK, checkpoint=None):
+
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd output needs the zstandard package (pip install zstandard)")
+
+        self.compression = compression
+        self.level = COMPRESSION_LEVELS[compression] if level is None else level
+        self.block_size = block_size
+        self.f = open_file_at_checkpoint(output_path, "wb", -1, checkpoint)
+        self.pool = ThreadPoolExecutor(max_workers=threads or DEFAULT_COMPRESSION_THREADS)
+        self.max_pending = 2 * (threads or DEFAULT_COMPRESSION_THREADS)    #blocks being compressed at a time
+        self.pending = deque()     #futures of the blocks being compressed (in order)
+        self.buffer = [checkpoint["buffer"]] if checkpoint and checkpoint["buffer"] else []
+        self.buffer_size = sum(len(data) for data in self.buffer)
+        self.blocks_written = 1 if checkpoint and checkpoint["position"] else 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffer_size += len(data)
+        if self.buffer_size >= self.block_size:
+            self.submit_block()
+        return len(data)
+
+    #send the buffered data to the pool, and write the compressed blocks that are ready
+    def submit_block(self):
+
+        if self.buffer:
+            block = b"".join(self.buffer)
+            self.buffer = []
+            self.buffer_size = 0
+            self.pending.append(self.pool.submit(compress_block, block, self.compression, self.level))
+
+        while len(self.pending) > self.max_pending or (self.pending and self.pending[0].done()):
+            self.f.write(self.pending.popleft().result())
+            self.blocks_written += 1
+
+    def flush(self):
+        self.submit_block()
+        while self.pending:
+            self.f.write(self.pending.popleft().result())
+            self.blocks_written += 1
+        self.f.flush()
+
+    #write the blocks being compressed, but keep the data of the current block (so that the blocks, and the
+    #compressed file, are the same as without checkpoints)
+    #returns {"position": bytes in the file, "buffer": data of the current block}
+    def checkpoint(self):
+        while self.pending:
+            self.f.write(self.pending.popleft().result())
+            self.blocks_written += 1
+        self.f.flush()
+        return {"position": self.f.tell(), "buffer": b"".join(self.buffer)}
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+            if not self.blocks_written:    #an empty file is not a valid gzip / zstd file
+                self.f.write(compress_block(b"", self.compression, self.level))
+        finally:
+            self.pool.shutdown()
+            self.f.close()
+            self.closed = True
+
+    #close the file without writing the current block (e.g. after an error, to resume it from a checkpoint)
+    def abort(self):
+        if self.closed:
+            return
+        self.pool.shutdown(cancel_futures=True)
+        self.f.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#Function to open a file for writing, or to reopen it at a checkpoint ({"position", "buffer"}):
+#what was written after the checkpoint is discarded
+def open_file_at_checkpoint(output_path, mode="wb", buffer_size=-1, checkpoint=None):
+
+    if checkpoint is None:
+        return open(output_path, mode, buffering=buffer_size)
+
+    if not os.path.isfile(output_path) or os.path.getsize(output_path) < checkpoint["position"]:
+        raise ValueError(f"{output_path} is shorter than its checkpoint, it cannot be resumed")
+    f = open(output_path, "r+b", buffering=buffer_size)
+    f.truncate(checkpoint["position"])
+    f.seek(checkpoint["position"])
+
+    return f
+
+#Function to open an output file for writing (compressed if its extension is .gz or .zst)
+#checkpoint reopens it at a checkpoint (see get_output_checkpoint)
+def open_output_file(output_path, buffer_size=DEFAULT_WRITE_BUFFER, checkpoint=None):
+
+    compression = get_compression(output_path)
+    if compression:
+        return ParallelCompressedFile(output_path, compression, checkpoint=checkpoint)
+
+    f = open_file_at_checkpoint(output_path, "wb", buffer_size, checkpoint)
+    if checkpoint and checkpoint["buffer"]:
+        f.write(checkpoint["buffer"])
+
+    return f
+
+#Function to close an output file without finishing it
+def abort_output_file(f):
+    if isinstance(f, ParallelCompressedFile):
+        f.abort()
+    else:
+        f.close()
+
+#Function to get the checkpoint of an output file (everything written so far is in the file, or in the buffer
+#of the current compressed block): {"position", "buffer"}
+def get_output_checkpoint(f):
+
+    if isinstance(f, ParallelCompressedFile):
+        return f.checkpoint()
+
+    f.flush()
+    return {"position": f.tell(), "buffer": b""}
+
+#Function to serialize an rdflib graph (e.g. the mapping) to a file, compressed if its extension is .gz or .zst
+def serialize_graph(g, output_path, rdf_format):
+    with open_output_file(output_path) as f:
+        g.serialize(destination=f, format=rdf_format)
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Streaming N-Triples / N-Quads writer
+#(compressed if the output file is .nt.gz or .nt.zst, see ParallelCompressedFile)
+#writer = NTriplesWriter("output.nt")
+#writer.write_batch(subjects, predicates, objects)
+#writer.close()
+#checkpoint (see get_checkpoint) resumes the output of an interrupted run
+class NTriplesWriter:
+
+    def __init__(self, output_path, rdf_format=None, buffer_size=DEFAULT_WRITE_BUFFER, checkpoint=None):
+        self.output_path = output_path
+        self.rdf_format = rdf_format or get_rdf_format(output_path)
+        self.f = open_output_file(output_path, buffer_size, checkpoint and checkpoint["file"])
+        self.triples_written = checkpoint["triples_written"] if checkpoint else 0
+        self.bytes_written = checkpoint["bytes_written"] if checkpoint else 0
+
+    #get the state of the writer, to resume the output from this point
+    def get_checkpoint(self):
+        return {"file": get_output_checkpoint(self.f), "triples_written": self.triples_written,
+            "bytes_written": self.bytes_written}
+
+    #write a batch of encoded terms (graphs are ignored in N-Triples)
+    #returns the number of triples written
+    def write_batch(self, subjects, predicates, objects, graphs=None):
+        if self.rdf_format != "nquads":
+            graphs = None
+        text, n_lines = get_lines(subjects, predicates, objects, graphs)
+        self.write_text(text, n_lines)
+        return n_lines
+
+    #write lines that are already formatted
+    def write_text(self, text, n_lines):
+        if text:
+            data = text.encode("utf-8")
+            self.f.write(data)
+            self.bytes_written += len(data)
+            self.triples_written += n_lines
+
+    #write a list of lines (each ending with a line break)
+    def write_lines(self, lines):
+        self.write_text("".join(lines), len(lines))
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+    #close the output without finishing it, so that it can be resumed from a checkpoint
+    def abort(self):
+        abort_output_file(self.f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Streaming writer that only writes each line once (deduplication)
+#lines are kept in a set (and written in their original order) until the set reaches the memory budget
+#after that, the set is frozen: new lines that are not in it are collected in sorted runs spilled to disk
+#(next to the output file), which are merged (removing repeated lines) at the end of the output when closing
+#writer = DedupNTriplesWriter("output.nt", dedup_memory=256 * 1024 * 1024)
+class DedupNTriplesWriter(NTriplesWriter):
+
+    def __init__(self, output_path, rdf_format=None, buffer_size=DEFAULT_WRITE_BUFFER, dedup_memory=DEFAULT_DEDUP_MEMORY,
+        checkpoint=None):
+        super().__init__(output_path, rdf_format, buffer_size, checkpoint)
+        self.dedup_memory = dedup_memory
+        self.seen = set()     #lines already written
+        self.seen_memory = 0
+        self.seen_delta = None     #lines added to the set since the last checkpoint (None before the first one)
+        self.frozen = False
+        self.run = []     #lines waiting to be spilled (once the set is frozen)
+        self.run_memory = 0
+        self.dedup_folder = None     #folder of the sorted runs and of the checkpointed set (created when needed)
+        self.seen_path_list = []     #files with the lines of the set, one per checkpoint
+        self.run_path_list = []
+        if checkpoint:
+            self.resume_dedup(checkpoint)
+
+    def get_dedup_folder(self):
+        if self.dedup_folder is None:
+            self.dedup_folder = tempfile.mkdtemp(prefix=get_dedup_folder_prefix(self.output_path),
+                dir=os.path.dirname(os.path.abspath(self.output_path)))
+        return self.dedup_folder
+
+    #the checkpoint only has the files of the deduplication folder, so it does not grow with the set:
+    #the lines added to the set since the last checkpoint are saved to a new file, and once the set is frozen,
+    #the lines waiting are spilled as a run
+    def get_checkpoint(self):
+
+        seen_delta = self.seen if self.seen_delta is None else self.seen_delta
+        if seen_delta:
+            seen_path = os.path.join(self.get_dedup_folder(), f"seen-{len(self.seen_path_list):06d}.nt")
+            with open(seen_path, "w", encoding="utf-8", newline="\n") as f:
+                f.writelines(seen_delta)
+            self.seen_path_list.append(seen_path)
+        self.seen_delta = []
+        if self.frozen:
+            self.spill_run()
+
+        checkpoint = super().get_checkpoint()
+        checkpoint.update({"seen_memory": self.seen_memory, "frozen": self.frozen, "dedup_folder": self.dedup_folder,
+            "seen_path_list": list(self.seen_path_list), "run_path_list": list(self.run_path_list)})
+        return checkpoint
+
+    def resume_dedup(self, checkpoint):
+
+        self.seen_memory = checkpoint["seen_memory"]
+        self.frozen = checkpoint["frozen"]
+        self.dedup_folder = checkpoint["dedup_folder"]
+        self.seen_path_list = list(checkpoint["seen_path_list"])
+        self.run_path_list = list(checkpoint["run_path_list"])
+        self.seen_delta = []
+
+        if not all(os.path.isfile(path) for path in self.seen_path_list + self.run_path_list):
+            raise ValueError(f"The deduplication files of {self.output_path} are missing, it cannot be resumed")
+        if self.dedup_folder is not None:
+            for file_name in os.listdir(self.dedup_folder):    #files written after the checkpoint
+                file_path = os.path.join(self.dedup_folder, file_name)
+                if file_path not in self.seen_path_list and file_path not in self.run_path_list:
+                    os.remove(file_path)
+        remove_stale_dedup_folders(self.output_path, self.dedup_folder)
+
+        for seen_path in self.seen_path_list:
+            with open(seen_path, "r", encoding="utf-8", newline="\n") as f:
+                self.seen.update(f)
+
+    #write a batch of encoded terms, skipping the lines already written
+    #returns the number of triples received (before deduplication, as NTriplesWriter)
+    def write_batch(self, subjects, predicates, objects, graphs=None):
+        if self.rdf_format != "nquads":
+            graphs = None
+        lines = get_line_array(subjects, predicates, objects, graphs)
+        self.write_lines(lines)
+        return len(lines)
+
+    #write lines that are already formatted
+    def write_text(self, text, n_lines):
+        if text:
+            self.write_lines([line + "\n" for line in text.split("\n")[:-1]])
+
+    #write a list of lines (each ending with a line break), skipping the lines already written
+    def write_lines(self, lines):
+
+        if not len(lines):
+            return
+
+        lines = pd.unique(np.asarray(lines, dtype=object))    #repeated lines of the batch (order is kept)
+        new_lines = [line for line in lines if line not in self.seen]
+        new_memory = sum(len(line) for line in new_lines) + DEDUP_LINE_OVERHEAD * len(new_lines)
+
+        if not self.frozen:
+            self.seen.update(new_lines)
+            self.seen_memory += new_memory
+            if self.seen_delta is not None:
+                self.seen_delta += new_lines
+            NTriplesWriter.write_text(self, "".join(new_lines), len(new_lines))
+            self.frozen = self.seen_memory > self.dedup_memory     #freeze the set
+            return
+
+        self.run += new_lines
+        self.run_memory += new_memory
+        if self.run_memory > self.dedup_memory // DEDUP_RUN_FRACTION:
+            self.spill_run()
+
+    #write the collected lines (sorted and without repetitions) to a run file
+    def spill_run(self):
+
+        if not self.run:
+            return
+
+        run_path = os.path.join(self.get_dedup_folder(), f"{len(self.run_path_list):06d}.nt")
+        with open(run_path, "w", encoding="utf-8", newline="\n") as f:
+            f.writelines(sorted(set(self.run)))
+        self.run_path_list.append(run_path)
+        self.run = []
+        self.run_memory = 0
+
+    #merge the sorted runs at the end of the output (repeated lines are consecutive once merged)
+    def merge_runs(self):
+
+        self.spill_run()
+        run_file_list = [open(run_path, "r", encoding="utf-8", newline="\n") for run_path in self.run_path_list]
+        try:
+            previous_line = None
+            block = []
+            for line in heapq.merge(*run_file_list):
+                if line != previous_line:
+                    block.append(line)
+                    previous_line = line
+                    if len(block) >= 100_000:
+                        NTriplesWriter.write_text(self, "".join(block), len(block))
+                        block = []
+            NTriplesWriter.write_text(self, "".join(block), len(block))
+        finally:
+            for f in run_file_list:
+                f.close()
+
+    def close(self):
+        if not self.f.closed:
+            try:
+                if self.frozen:
+                    self.merge_runs()
+            finally:
+                self.seen = set()
+                self.seen_delta = None
+                self.f.close()
+                if self.dedup_folder is not None:
+                    shutil.rmtree(self.dedup_folder, ignore_errors=True)
+
+    #the deduplication folder is kept for the checkpoint
+    def abort(self):
+        self.seen = set()
+        self.seen_delta = None
+        abort_output_file(self.f)
+
+#Function to get the prefix of the deduplication folders of an output (next to it)
+def get_dedup_folder_prefix(output_path):
+    return ".rdfolio_dedup_" + os.path.basename(output_path) + "_"
+
+#Function to remove the deduplication folders of an output left by interrupted runs (except keep_folder)
+#(tempfile.mkdtemp adds 8 characters to the prefix)
+def remove_stale_dedup_folders(output_path, keep_folder=None):
+
+    folder = os.path.dirname(os.path.abspath(output_path))
+    prefix = get_dedup_folder_prefix(output_path)
+    for file_name in os.listdir(folder):
+        file_path = os.path.join(folder, file_name)
+        if (file_name.startswith(prefix) and len(file_name) == len(prefix) + 8 and os.path.isdir(file_path)
+            and (keep_folder is None or os.path.abspath(file_path) != os.path.abspath(keep_folder))):
+            shutil.rmtree(file_path, ignore_errors=True)
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Functions to get the paths of the files of a sharded output
+#output.nt.gz -> output-00000-of-00008.nt.gz ... and output.manifest.json
+def split_output_path(output_path):
+
+    compression = get_compression(output_path)
+    compression_extension = COMPRESSION_EXTENSIONS[compression] if compression else ""
+    root, extension = os.path.splitext(output_path[:len(output_path) - len(compression_extension)])
+
+    return root, extension + compression_extension
+
+def get_shard_path(output_path, shard, n_shards):
+    root, extension = split_output_path(output_path)
+    return f"{root}-{shard:05d}-of-{n_shards:05d}{extension}"
+
+def get_manifest_path(output_path):
+    return split_output_path(output_path)[0] + ".manifest.json"
+
+#Function to get the shard of each subject (stable hash of the encoded subject, the same in every run and process)
+def get_subject_shards(subjects, n_shards):
+    return pd.util.hash_array(np.asarray(subjects, dtype=object)) % np.uint64(n_shards)
+
+#Function to get the SHA-256 of a file
+def get_file_sha256(file_path):
+
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(CHECKSUM_BUFFER):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()
+
+#Function to get the manifest entries of the files of a split output ({"name", "triples", "bytes", "sha256"})
+#the checksums are computed in parallel (hashlib releases the GIL)
+def get_manifest_files(path_list, writer_list):
+
+    with ThreadPoolExecutor(max_workers=DEFAULT_COMPRESSION_THREADS) as pool:
+        sha256_list = list(pool.map(get_file_sha256, path_list))
+
+    return [{"name": os.path.basename(file_path), "triples": writer.triples_written,
+        "bytes": os.path.getsize(file_path), "sha256": sha256}
+        for file_path, writer, sha256 in zip(path_list, writer_list, sha256_list)]
+
+def write_manifest(manifest_path, manifest):
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Streaming writer that splits the output into n_shards files by subject (all the triples of a subject in the same file)
+#each shard is written by an NTriplesWriter (or a DedupNTriplesWriter, with dedup_memory shared by the shards)
+#when closed, it writes a JSON manifest with the name, number of triples, size and SHA-256 of each shard
+#writer = ShardedNTriplesWriter("output.nt", 8)
+class ShardedNTriplesWriter:
+
+    def __init__(self, output_path, n_shards, rdf_format=None, buffer_size=DEFAULT_WRITE_BUFFER, dedup_memory=None,
+        checkpoint=None):
+
+        if n_shards < 1:
+            raise ValueError("The number of shards must be at least 1")
+
+        self.output_path = output_path
+        self.rdf_format = rdf_format or get_rdf_format(output_path)
+        self.n_shards = n_shards
+        self.manifest_path = get_manifest_path(output_path)
+        self.shard_path_list = [get_shard_path(output_path, shard, n_shards) for shard in range(n_shards)]
+        shard_buffer_size = max(buffer_size // n_shards, 64 * 1024)
+        shard_checkpoint_list = checkpoint["shards"] if checkpoint else [None] * n_shards
+        if dedup_memory:
+            self.writer_list = [DedupNTriplesWriter(shard_path, self.rdf_format, shard_buffer_size, dedup_memory // n_shards,
+                shard_checkpoint) for shard_path, shard_checkpoint in zip(self.shard_path_list, shard_checkpoint_list)]
+        else:
+            self.writer_list = [NTriplesWriter(shard_path, self.rdf_format, shard_buffer_size, shard_checkpoint)
+                for shard_path, shard_checkpoint in zip(self.shard_path_list, shard_checkpoint_list)]
+        self.closed = False
+
+    def get_checkpoint(self):
+        return {"shards": [writer.get_checkpoint() for writer in self.writer_list]}
+
+    @property
+    def triples_written(self):
+        return sum(writer.triples_written for writer in self.writer_list)
+
+    @property
+    def bytes_written(self):
+        return sum(writer.bytes_written for writer in self.writer_list)
+
+    #write a batch of encoded terms, each triple to the shard of its subject
+    #returns the number of triples received
+    def write_batch(self, subjects, predicates, objects, graphs=None):
+
+        if self.rdf_format != "nquads":
+            graphs = None
+        subjects = np.asarray(subjects, dtype=object)
+        predicates = np.asarray(predicates, dtype=object)
+        objects = np.asarray(objects, dtype=object)
+        if graphs is not None and not isinstance(graphs, str):
+            graphs = np.asarray(graphs, dtype=object)
+
+        valid = pd.notna(subjects) & pd.notna(predicates) & pd.notna(objects)
+        lines = get_line_array(subjects, predicates, objects, graphs)
+        self.write_routed_lines(lines, get_subject_shards(subjects[valid], self.n_shards))
+
+        return len(lines)
+
+    #write lines that are already formatted
+    def write_text(self, text, n_lines):
+        if text:
+            self.write_lines([line + "\n" for line in text.split("\n")[:-1]])
+
+    #write a list of lines (each ending with a line break), the subject is the first term of the line
+    def write_lines(self, lines):
+
+        if not len(lines):
+            return
+
+        lines = np.asarray(lines, dtype=object)
+        subjects = pd.Series(lines, dtype=object).str.split(" ", n=1).str[0]
+        self.write_routed_lines(lines, get_subject_shards(subjects, self.n_shards))
+
+    def write_routed_lines(self, lines, shards):
+        for shard in np.unique(shards):
+            self.writer_list[int(shard)].write_lines(lines[shards == shard])
+
+    def flush(self):
+        for writer in self.writer_list:
+            writer.flush()
+
+    #close the shards and write the manifest
+    def close(self):
+
+        if self.closed:
+            return
+        self.closed = True
+
+        for writer in self.writer_list:
+            writer.close()
+
+        write_manifest(self.manifest_path, {"format": self.rdf_format, "compression": get_compression(self.output_path),
+            "shards": self.n_shards, "sharding": "pandas.util.hash_array(subject) % shards",
+            "triples": self.triples_written, "files": get_manifest_files(self.shard_path_list, self.writer_list)})
+
+    #close the shards without writing the manifest
+    def abort(self):
+        self.closed = True
+        for writer in self.writer_list:
+            writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to get the graph of each N-Quads line (None for the lines in the default graph)
+#and the line without it (N-Triples)
+#the graph is the last term, if there are four terms (subjects and predicates have no spaces, and a literal
+#object can only end with a quote, a language tag or a datatype IRI right after the quote)
+def split_quad_lines(lines):
+
+    lines = pd.Series(lines, dtype=object)
+    triples = lines.str[:-3]     #without " .\n"
+    object_graph = triples.str.split(" ", n=2).str[2]
+    last_term = object_graph.str.rsplit(" ", n=1).str[-1]
+    has_graph = object_graph.str.contains(" ", regex=False) & ~last_term.str.contains('"', regex=False) & \
+        ((last_term.str.startswith("<") & last_term.str.endswith(">")) | last_term.str.startswith("_:"))
+
+    graphs = last_term.where(has_graph)
+    triple_lines = triples.where(~has_graph, triples.str.rsplit(" ", n=1).str[0]) + " .\n"
+
+    return graphs.to_numpy(), triple_lines.to_numpy()
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Streaming writer that writes the triples of each graph to its own N-Triples file
+#output.nq -> output-default.nt (default graph), output-graph-00000.nt, output-graph-00001.nt... (named graphs,
+#in the order they appear), compressed if the output is .gz or .zst
+#when closed, it writes a JSON manifest (output.manifest.json) with the graph, name, number of triples,
+#size and SHA-256 of each file
+#with dedup_memory, each file is written by a DedupNTriplesWriter with that memory budget
+#the materializer sees it as an N-Quads writer (rdf_format), so it generates the graphs of the triples
+#writer = GraphNTriplesWriter("output.nq")
+class GraphNTriplesWriter:
+
+    def __init__(self, output_path, buffer_size=DEFAULT_WRITE_BUFFER, dedup_memory=None):
+
+        self.output_path = output_path
+        self.rdf_format = "nquads"
+        self.buffer_size = buffer_size
+        self.dedup_memory = dedup_memory
+        self.manifest_path = get_manifest_path(output_path)
+        root, extension = split_output_path(output_path)
+        compression = get_compression(output_path)
+        self.root = root
+        self.extension = RDF_FORMAT_EXTENSIONS["ntriples"] + (COMPRESSION_EXTENSIONS[compression] if compression else "")
+        self.writer_dict = {}     #{encoded graph (None for the default graph): writer}
+        self.path_dict = {}
+        self.closed = False
+
+    @property
+    def triples_written(self):
+        return sum(writer.triples_written for writer in self.writer_dict.values())
+
+    @property
+    def bytes_written(self):
+        return sum(writer.bytes_written for writer in self.writer_dict.values())
+
+    #get the writer of a graph (opened the first time the graph appears)
+    def get_graph_writer(self, graph):
+
+        if graph not in self.writer_dict:
+            if graph is None:
+                graph_path = f"{self.root}-default{self.extension}"
+            else:
+                graph_path = f"{self.root}-graph-{sum(g is not None for g in self.writer_dict):05d}{self.extension}"
+            if self.dedup_memory:
+                self.writer_dict[graph] = DedupNTriplesWriter(graph_path, "ntriples", self.buffer_size, self.dedup_memory)
+            else:
+                self.writer_dict[graph] = NTriplesWriter(graph_path, "ntriples", self.buffer_size)
+            self.path_dict[graph] = graph_path
+
+        return self.writer_dict[graph]
+
+    #write a batch of encoded terms, each triple to the file of its graph
+    #graphs is None (default graph), one encoded graph for the whole batch, or an aligned array (null = default graph)
+    #returns the number of triples received
+    def write_batch(self, subjects, predicates, objects, graphs=None):
+
+        if graphs is None or isinstance(graphs, str):
+            lines = get_line_array(subjects, predicates, objects)
+            self.get_graph_writer(graphs).write_lines(lines)
+            return len(lines)
+
+        subjects = np.asarray(subjects, dtype=object)
+        predicates = np.asarray(predicates, dtype=object)
+        objects = np.asarray(objects, dtype=object)
+        valid = pd.notna(subjects) & pd.notna(predicates) & pd.notna(objects)
+        lines = get_line_array(subjects, predicates, objects)
+        self.write_routed_lines(lines, np.asarray(graphs, dtype=object)[valid])
+
+        return len(lines)
+
+    #write lines that are already formatted (N-Quads)
+    def write_text(self, text, n_lines):
+        if text:
+            self.write_lines([line + "\n" for line in text.split("\n")[:-1]])
+
+    #write a list of N-Quads lines (each ending with a line break)
+    def write_lines(self, lines):
+
+        if not len(lines):
+            return
+
+        graphs, lines = split_quad_lines(lines)
+        self.write_routed_lines(lines, graphs)
+
+    def write_routed_lines(self, lines, graphs):
+
+        graph_keys = pd.Series(graphs, dtype=object).fillna("")     #"" is the default graph
+        for graph, positions in graph_keys.groupby(graph_keys.to_numpy(), sort=False).indices.items():
+            self.get_graph_writer(graph or None).write_lines(lines[positions])
+
+    def flush(self):
+        for writer in self.writer_dict.values():
+            writer.flush()
+
+    #close the files and write the manifest
+    def close(self):
+
+        if self.closed:
+            return
+        self.closed = True
+
+        for writer in self.writer_dict.values():
+            writer.close()
+
+        graph_list = list(self.writer_dict)
+        files = get_manifest_files([self.path_dict[graph] for graph in graph_list],
+            [self.writer_dict[graph] for graph in graph_list])
+        for graph, graph_file in zip(graph_list, files):
+            graph_file["graph"] = graph[1:-1] if graph and graph.startswith("<") else graph
+
+        write_manifest(self.manifest_path, {"format": "ntriples", "compression": get_compression(self.output_path),
+            "graphs": len(graph_list), "triples": self.triples_written, "files": files})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#________________________________________________________
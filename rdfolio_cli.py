@@ -0,0 +1,233 @@
+import argparse
+import os #for file navigation
+import pickle
+import sys
+import time
+from rdflib import Graph
+from rdflib.util import guess_format
+
+#Command line entry point (no browser session needed, e.g. for batch jobs under cron)
+#python rdfolio_cli.py materialize saved_mappings/example.pkl output.nt --workers 8
+#python rdfolio_cli.py materialize saved_mappings/example.pkl output.nt --checkpoint (run it again to resume)
+#python rdfolio_cli.py incremental saved_mappings/example.pkl additions.nt deletions.nt --state .rdfolio_state
+#python rdfolio_cli.py export saved_mappings/example.pkl exported_mappings/example.ttl
+#streamlit is never imported, and pandas is only imported by the materialize command
+
+
+#_________________________________________________________
+#{extension: rdflib format} for the export command (same formats as the Export mapping panel)
+EXPORT_FORMATS = {".ttl": "turtle", ".n3": "n3", ".nt": "ntriples", ".nq": "nquads", ".trig": "trig",
+    ".jsonld": "json-ld", ".xml": "xml", ".trix": "trix", ".hext": "hext", ".patch": "patch"}
+#________________________________________________________
+
+
+#_________________________________________________________
+#Function to load a mapping from a pkl file (saved progress) or an RDF file (exported mapping)
+def load_mapping(mapping_path):
+
+    if mapping_path.lower().endswith(".pkl"):
+        with open(mapping_path, "rb") as f:
+            return pickle.load(f)
+
+    g = Graph()
+    g.parse(mapping_path, format=guess_format(mapping_path) or "turtle")
+    return g
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Functions to print the report of a run
+def print_timing(label, seconds):
+    print(f"{label:<24}{seconds:>10.3f} s")
+
+#rows, triples and bytes of each TriplesMap, and seconds spent reading, generating the terms, joining and writing
+STATS_COLUMNS = [("rows", "rows"), ("triples", "triples"), ("bytes", "bytes"), ("read_seconds", "read s"),
+    ("template_seconds", "template s"), ("join_seconds", "join s"), ("write_seconds", "write s")]
+
+def print_stats(stats_dict, seconds):
+
+    label_width = max([len("TriplesMap")] + [len(tmap_label) for tmap_label in stats_dict]) + 2
+    print(f"{'TriplesMap':<{label_width}}" + "".join(f"{header:>14}" for key, header in STATS_COLUMNS))
+    for tmap_label, stats in list(stats_dict.items()) + [("TOTAL", None)]:
+        if stats is None:
+            stats = {key: sum(tmap_stats[key] for tmap_stats in stats_dict.values()) for key, header in STATS_COLUMNS}
+        print(f"{tmap_label:<{label_width}}" + "".join(f"{stats[key]:>14,.3f}" if key.endswith("_seconds")
+            else f"{stats[key]:>14,}" for key, header in STATS_COLUMNS))
+
+    total_triples = sum(stats["triples"] for stats in stats_dict.values())
+    if seconds > 0:
+        print(f"{total_triples / seconds:,.0f} triples/s")
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Command to materialize a mapping
+def run_materialize(args):
+
+    start = time.perf_counter()
+    import materializer
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    g = load_mapping(args.mapping)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plan = materializer.get_mapping_plan(g)
+    plan_seconds = time.perf_counter() - start
+
+    checkpoint_path = materializer.get_checkpoint_path(args.output) if args.checkpoint else None
+    if checkpoint_path and os.path.isfile(checkpoint_path):
+        print(f"Resuming from checkpoint {checkpoint_path}")
+
+    start = time.perf_counter()
+    stats_dict = materializer.materialize(plan, args.output, ds_folder=args.data_sources,
+        chunksize=args.chunksize, workers=args.workers, join_memory=args.join_memory * 1024 * 1024,
+        dedup_memory=args.dedup_memory * 1024 * 1024 if args.dedup else None, shards=args.shards,
+        graph_files=args.graph_files, checkpoint_path=checkpoint_path, checkpoint_interval=args.checkpoint_interval,
+        report_path=args.report)
+    materialize_seconds = time.perf_counter() - start
+
+    print_stats(stats_dict, materialize_seconds)
+    print()
+    print_timing("import engine", import_seconds)
+    print_timing("load mapping", load_seconds)
+    print_timing("compile plan", plan_seconds)
+    print_timing("materialize", materialize_seconds)
+    if args.shards or args.graph_files:
+        import rdf_writers
+        print(f"Output: manifest {rdf_writers.get_manifest_path(args.output)}")
+    else:
+        print(f"Output: {args.output} ({os.path.getsize(args.output):,} bytes)")
+    if args.report:
+        print(f"Report: {args.report}")
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Command to materialize only the changes in the data sources since the last run (see materializer.materialize_incremental)
+def run_incremental(args):
+
+    import materializer
+
+    start = time.perf_counter()
+    g = load_mapping(args.mapping)
+    stats = materializer.materialize_incremental(g, args.additions, args.deletions, args.state,
+        ds_folder=args.data_sources, chunksize=args.chunksize)
+    seconds = time.perf_counter() - start
+
+    label_width = max([len("TriplesMap")] + [len(tmap_label) for tmap_label in stats["triplesmaps"]]) + 2
+    print(f"{'TriplesMap':<{label_width}}{'rows':>14}{'added rows':>14}{'removed rows':>14}")
+    for tmap_label, tmap_stats in stats["triplesmaps"].items():
+        print(f"{tmap_label:<{label_width}}{tmap_stats['rows']:>14,}{tmap_stats['added_rows']:>14,}"
+            f"{tmap_stats['removed_rows']:>14,}")
+    print()
+    print(f"Additions: {args.additions} ({stats['additions']:,} triples)")
+    print(f"Deletions: {args.deletions} ({stats['deletions']:,} triples)")
+    print_timing("incremental run", seconds)
+
+#________________________________________________________
+
+
+#_________________________________________________________
+#Command to export a mapping to an RDF file (compressed if the output file is .gz or .zst, e.g. mapping.ttl.gz)
+def run_export(args):
+
+    import rdf_writers
+
+    output_file = args.output
+    compression = rdf_writers.get_compression(output_file)
+    if compression:
+        output_file = output_file[:-len(rdf_writers.COMPRESSION_EXTENSIONS[compression])]
+    export_format = args.format or EXPORT_FORMATS.get(os.path.splitext(output_file)[1].lower())
+    if not export_format:
+        raise ValueError(f"Unknown export format for {args.output}, please use --format")
+
+    start = time.perf_counter()
+    g = load_mapping(args.mapping)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rdf_writers.serialize_graph(g, args.output, export_format)
+    export_seconds = time.perf_counter() - start
+
+    print(f"Mapping triples: {len(g):,}")
+    print_timing("load mapping", load_seconds)
+    print_timing("export", export_seconds)
+    print(f"Output: {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+#________________________________________________________
+
+
+#_________________________________________________________
+def get_argument_parser():
+
+    parser = argparse.ArgumentParser(prog="rdfolio_cli.py",
+        description="Materialize or export RDFolio mappings without the web app.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    materialize_parser = subparsers.add_parser("materialize", help="run the mapping against its data sources")
+    materialize_parser.add_argument("mapping", help="saved mapping (.pkl) or exported mapping (.ttl...)")
+    materialize_parser.add_argument("output", help="output file (.nt or .nq, compressed if .nt.gz or .nt.zst)")
+    materialize_parser.add_argument("--data-sources", default=None,
+        help="folder with the data sources (default: ./data_sources)")
+    materialize_parser.add_argument("--workers", type=int, default=1,
+        help="worker processes (0 = one per core, default: 1)")
+    materialize_parser.add_argument("--chunksize", type=int, default=100_000, help="rows read at a time")
+    materialize_parser.add_argument("--join-memory", type=int, default=512,
+        help="memory budget (MB) of the build side of each join")
+    materialize_parser.add_argument("--dedup", action="store_true", help="write each triple only once")
+    materialize_parser.add_argument("--dedup-memory", type=int, default=256,
+        help="memory budget (MB) of the deduplication, then sorted runs are spilled to disk")
+    materialize_parser.add_argument("--shards", type=int, default=None,
+        help="split the output into this many files by subject (output-00000-of-0000K.nt...) with a manifest")
+    materialize_parser.add_argument("--graph-files", action="store_true",
+        help="write the triples of each graph (rr:graph / rr:graphMap) to their own file, with a manifest")
+    materialize_parser.add_argument("--checkpoint", action="store_true",
+        help="write periodic checkpoints to OUTPUT.checkpoint, and resume from it if it exists (needs --workers 1)")
+    materialize_parser.add_argument("--checkpoint-interval", type=float, default=60,
+        help="seconds between two checkpoints (default: 60)")
+    materialize_parser.add_argument("--report", default=None,
+        help="save the report of the run (stats and times of each TriplesMap) to this JSON file")
+    materialize_parser.set_defaults(function=run_materialize)
+
+    incremental_parser = subparsers.add_parser("incremental",
+        help="write only the triples to add and to remove since the last incremental run")
+    incremental_parser.add_argument("mapping", help="saved mapping (.pkl) or exported mapping (.ttl...)")
+    incremental_parser.add_argument("additions", help="output file with the triples to add (.nt)")
+    incremental_parser.add_argument("deletions", help="output file with the triples to remove (.nt)")
+    incremental_parser.add_argument("--state", required=True, help="folder with the state of the previous runs")
+    incremental_parser.add_argument("--data-sources", default=None,
+        help="folder with the data sources (default: ./data_sources)")
+    incremental_parser.add_argument("--chunksize", type=int, default=100_000, help="rows read at a time")
+    incremental_parser.set_defaults(function=run_incremental)
+
+    export_parser = subparsers.add_parser("export", help="export the mapping to an RDF file")
+    export_parser.add_argument("mapping", help="saved mapping (.pkl) or exported mapping (.ttl...)")
+    export_parser.add_argument("output", help="output file (the format is taken from the extension, .gz or .zst to compress)")
+    export_parser.add_argument("--format", default=None, help="rdflib format (turtle, ntriples...)")
+    export_parser.set_defaults(function=run_export)
+
+    return parser
+
+def main(argv=None):
+
+    args = get_argument_parser().parse_args(argv)
+    if getattr(args, "workers", 1) == 0:
+        args.workers = None
+
+    try:
+        args.function(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#________________________________________________________
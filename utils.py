@@ -7,6 +7,7 @@ from urllib.parse import urlparse
 import pandas as pd
 from rdflib.namespace import split_uri
 from rdflib.namespace import RDF, RDFS, OWL
+import materializer
 
 #________________________________________________
 #AESTHETICS
@@ -247,9 +248,16 @@ def is_valid_iri(iri):
 #_________________________________________________
 #Allowed data formats
 def get_ds_allowed_formats():
-    allowed_formats_list = (".csv",".json", ".xml")
+    allowed_formats_list = (".csv",".json", ".xml", ".parquet") + get_ds_sqlite_formats()
     return allowed_formats_list
 
+#SQLite data sources (same extensions as the materializer)
+def get_ds_sqlite_formats():
+    return tuple("." + extension for extension in materializer.SQLITE_EXTENSIONS)
+
+def is_ds_sqlite(ds_file):
+    return ds_file.lower().endswith(get_ds_sqlite_formats())
+
 
 #_________________________________________________
 
@@ -334,10 +342,49 @@ def get_ds_full_path(filename):
     full_path = os.path.join(folder_path, filename)
     return full_path
 
+#Function to get the tables (and views) of a SQLite data source
+def get_ds_table_list(ds_file):
+    return materializer.get_sqlite_table_list(ds_file)
+
 def get_ds_folder_path():
     folder_path = os.path.abspath(".\\data_sources")
     return folder_path
 
+#Function to get the columns of a data source file without reading the whole file
+#(only the header of csv files, only the first records of JSON and XML files, only the schema of parquet files)
+#the iterator (JSON, XML) and the table or query (SQLite, no rows are read) are those of the logical source
+def get_ds_column_list(ds_file, logical_source=None):
+
+    if logical_source is not None:
+        options = materializer.get_logical_source_options(st.session_state["g_mapping"], logical_source)
+    else:
+        options = {"iterator": None, "table": None, "query": None}
+
+    if is_ds_sqlite(ds_file):
+        if options["table"] is None and options["query"] is None:
+            return []
+        return materializer.get_sqlite_column_list(ds_file, options["table"], options["query"])
+
+    if ds_file.lower().endswith(".parquet"):
+        return materializer.get_parquet_column_list(ds_file)
+
+    if ds_file.lower().endswith(".csv"):
+        return pd.read_csv(ds_file, sep=materializer.get_csv_delimiter(ds_file), nrows=0,
+            encoding="utf-8-sig").columns.tolist()
+
+    if ds_file.lower().endswith(".json"):
+        chunks = materializer.read_json_chunks(ds_file, options["iterator"], chunksize=100)
+    elif ds_file.lower().endswith(".xml"):
+        chunks = materializer.read_xml_chunks(ds_file, options["iterator"], chunksize=100)
+    else:
+        return []
+
+    try:
+        first_rows = next(chunks, None)
+    finally:
+        chunks.close()
+    return first_rows.columns.tolist() if first_rows is not None else []
+
 def get_g_full_path(filename):
     folder_path = get_g_folder_path()
     full_path = os.path.join(folder_path, filename)
@@ -379,7 +426,9 @@ def get_map_dict(map_label, map_dict):   #HERE FIX
 #___________________________________________________________________________________
 #Function to create new map: assign name, data source and data format
 #It also builds a dictionary to save the new maps: {map name: map}
-def add_logical_source(g, tmap_label, source_file, logical_source_iri):
+#SQLite data sources also need a table (rr:tableName) or a query (rml:query)
+#JSON and XML data sources can have an rml:iterator (otherwise the materializer uses $[*] or /*/*)
+def add_logical_source(g, tmap_label, source_file, logical_source_iri, table=None, query=None, iterator=None):
 
     tmap_iri = MAP[f"{tmap_label}"]
 
@@ -393,9 +442,20 @@ def add_logical_source(g, tmap_label, source_file, logical_source_iri):
         g.add((logical_source_iri, QL.referenceFormulation, QL.JSONPath))
     elif file_extension.lower() == "xml":
         g.add((logical_source_iri, QL.referenceFormulation, QL.XPath))
+    elif file_extension.lower() == "parquet":
+        g.add((logical_source_iri, QL.referenceFormulation, QL.Parquet))
+    elif file_extension.lower() in materializer.SQLITE_EXTENSIONS:
+        g.add((logical_source_iri, QL.referenceFormulation, QL.SQL2008))
+        if query:
+            g.add((logical_source_iri, RML.query, Literal(query)))
+        else:
+            g.add((logical_source_iri, RR.tableName, Literal(table)))
     else:
         raise ValueError(f"Unsupported format: {file_extension}")   #this wont happen, since only allowed extensions are given in selectbox
 
+    if iterator and file_extension.lower() in ("json", "xml"):
+        g.add((logical_source_iri, RML.iterator, Literal(iterator)))
+
 #___________________________________________________________________________________
 
 
@@ -559,6 +619,34 @@ def build_complete_subject_df():
 
 #___________________________________________________________________________________
 
+#___________________________________________________________________________________
+#Function to read the first rows of a data source for the materialization preview
+#cached (source_key and ds_mtime are the cache key, the rules are not hashed), so the file is only read again
+#if it changes or more rows are needed
+@st.cache_data(show_spinner=False, max_entries=32)
+def read_ds_preview_rows(_rules, source_key, n_rows, ds_mtime):
+    return materializer.read_source_head(_rules, n_rows)
+
+#Function to preview the triples generated by a TriplesMap on the first rows of its data source
+#only the rules of the previewed TriplesMap are compiled (not the whole plan of the mapping)
+#returns a dataframe with the columns Subject, Predicate, Object (empty if the TriplesMap generates no triples)
+def get_triplesmap_preview(tmap_label, n_rows=10):
+
+    g = st.session_state["g_mapping"]   #for convenience
+    tmap = next((tm for tm in g.subjects(RML.logicalSource, None) if materializer.get_node_label(tm) == tmap_label), None)
+    rules = materializer.compile_tmap_rules(g, tmap) if tmap is not None else None
+
+    if not rules or not rules["subject"] or not rules["source"]:
+        return materializer.preview_triplesmap(None, None)
+
+    ds_file = materializer.get_source_path(rules)
+    rows = read_ds_preview_rows(rules, materializer.get_source_key(rules), n_rows, os.path.getmtime(ds_file))
+
+    return materializer.preview_triplesmap(rules, rows)
+
+#___________________________________________________________________________________
+
+
 #___________________________________________________________________________________
 #Function to check whether an ontology is valid
 def is_valid_ontology(url: str):